@@ -1,17 +1,38 @@
 # filepath: /Users/supremegg/Documents/GitHub/nus-hacks/backend/src/agent.py
 import os
-from typing import Dict, List, Any, TypedDict, Annotated
+from typing import (
+    AsyncIterator,
+    Dict,
+    List,
+    Any,
+    Optional,
+    Tuple,
+    TypedDict,
+    Annotated,
+)
 import logging
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.graph import StateGraph, END
-from langchain.schema import HumanMessage, AIMessage, Document
-from langchain_core.messages import BaseMessage, ToolMessage
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+import asyncio
 import json
 import operator
 import random
+import time
+from component_parser import ComponentStreamParser
+from component_schema import component_specs_text, components_response_schema
+from context_budget import estimate_tokens, pack, split_budget, truncate
+from lazy import Lazy
+from rag_manager import rag_manager
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+from image_store import PLACEHOLDER
 from tools import (
+    IMAGE_GENERATION,
+    image_generator,
+    image_store,
     research_tools,
     ui_tools,
     web_search_tool_fn,
@@ -24,21 +45,52 @@ from tools import (
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
-# Initialize the LLMs
-research_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    google_api_key=os.getenv("GOOGLE_API_KEY"),
-)
+# Model configuration, also part of the response cache key
+MODEL_CONFIG = {
+    "research_model": "gemini-2.0-flash",
+    "ui_model": "gemini-2.0-flash",
+    "ui_temperature": 0.9,  # Higher creativity for UI generation
+}
+
+
+def create_llm(model: str, **kwargs):
+    # Imported here, langchain_google_genai alone takes seconds to import
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=model, google_api_key=os.getenv("GOOGLE_API_KEY"), **kwargs
+    )
+
+
+# Initialize the LLMs, built on first use
+research_llm = Lazy("research_llm", lambda: create_llm(MODEL_CONFIG["research_model"]))
 
-ui_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    google_api_key=os.getenv("GOOGLE_API_KEY"),
-    temperature=0.9,  # Higher creativity for UI generation
+ui_llm = Lazy(
+    "ui_llm",
+    lambda: create_llm(
+        MODEL_CONFIG["ui_model"], temperature=MODEL_CONFIG["ui_temperature"]
+    ),
 )
 
 # Bind tools to respective LLMs
-research_llm_with_tools = research_llm.bind_tools(research_tools)
-ui_llm_with_tools = ui_llm.bind_tools(ui_tools)
+research_llm_with_tools = Lazy(
+    "research_llm_with_tools", lambda: research_llm.bind_tools(research_tools)
+)
+ui_llm_with_tools = Lazy("ui_llm_with_tools", lambda: ui_llm.bind_tools(ui_tools))
+# The designer after its tool round: the tools stay declared for the history,
+# but the reply has to be the plan
+ui_llm_plan = Lazy(
+    "ui_llm_plan", lambda: ui_llm.bind_tools(ui_tools, tool_choice="none")
+)
+
+# Fast mode writes the components in one call, constrained to their schema;
+# the raw message is kept for its token usage
+fast_ui_llm = Lazy(
+    "fast_ui_llm",
+    lambda: ui_llm.with_structured_output(
+        components_response_schema(), method="json_mode", include_raw=True
+    ),
+)
 
 
 # Define knowledge container
@@ -47,7 +99,31 @@ class KnowledgeState(TypedDict):
     search: List[Dict[str, Any]]
     images: List[Dict[str, Any]]
     ui_images: List[Dict[str, Any]]
-    generated_images: Dict[str, str]  # prompt -> image_data mapping
+    generated_images: Dict[str, str]  # image handle -> prompt, see image_generator
+
+
+def empty_knowledge() -> KnowledgeState:
+    return {
+        "docs": [],
+        "search": [],
+        "images": [],
+        "ui_images": [],
+        "generated_images": {},
+    }
+
+
+def merge_knowledge(current: KnowledgeState, update: Dict[str, Any]) -> KnowledgeState:
+    """Reducer that merges a knowledge delta into a new KnowledgeState.
+
+    Lists are appended and dicts are merged; neither input is mutated.
+    """
+    merged = {**empty_knowledge(), **(current or {})}
+    for key, value in update.items():
+        if isinstance(value, dict):
+            merged[key] = {**merged[key], **value}
+        else:
+            merged[key] = merged[key] + list(value)
+    return merged
 
 
 # Define the state structure
@@ -55,154 +131,399 @@ class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], operator.add]
     ui_messages: Annotated[List[BaseMessage], operator.add]
     prompt: str
-    knowledge: KnowledgeState
+    knowledge: Annotated[KnowledgeState, merge_knowledge]
     design_plan: str  # Creative design plan from UI Designer
     final_ui: Dict[str, Any]
     user_id: str
+    rag_k: Optional[int]  # chunks retrieved per RAG query, None for the default
+    theme: Optional[str]  # design theme, picked at random when not set
+    layout_seed: Optional[int]  # creative seed, picked at random when not set
     iteration_count: int
+    deadline: float  # time.monotonic() by which the UI should be ready
+    tokens_used: Annotated[int, operator.add]
+    tool_calls_used: Annotated[int, operator.add]
+
+
+# Per-call timeout for tool execution, in seconds
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+
+# Longest a finished UI waits for images still being generated, in seconds
+IMAGE_WAIT_GRACE = float(os.getenv("IMAGE_WAIT_GRACE", "2"))
+
+# Per-request budget. Research stops when it runs out, keeping the reserves
+# for UI design and implementation, or as soon as enough sources are found.
+BUDGET = {
+    "deadline": float(os.getenv("AGENT_DEADLINE", "60")),
+    "ui_time_reserve": float(os.getenv("AGENT_UI_TIME_RESERVE", "25")),
+    "max_tokens": int(os.getenv("AGENT_MAX_TOKENS", "60000")),
+    "ui_token_reserve": int(os.getenv("AGENT_UI_TOKEN_RESERVE", "20000")),
+    "max_tool_calls": int(os.getenv("AGENT_MAX_TOOL_CALLS", "12")),
+    "max_research_rounds": int(os.getenv("RESEARCH_MAX_ROUNDS", "3")),
+    "enough_sources": int(os.getenv("RESEARCH_ENOUGH_SOURCES", "8")),
+}
+
+# Input tokens of each UI prompt, instructions and context together. The
+# context sections are packed with their most relevant items to fit.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+MAX_USER_PROMPT_TOKENS = PROMPT_TOKEN_BUDGET // 4
+# Share of the research context of each section
+CONTEXT_WEIGHTS = {"search": 0.4, "images": 0.15, "docs": 0.45}
+# Tokens of each tool result fed back into the research history
+TOOL_RESULT_TOKEN_BUDGET = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET", "800"))
+# Input tokens of each research call, the whole message history together
+RESEARCH_TOKEN_BUDGET = int(os.getenv("RESEARCH_TOKEN_BUDGET", "8000"))
+
+OMITTED_RESULT = "(Earlier result omitted to fit the context, see the later results)"
+
+
+def tool_result_text(result: Any, query: str = "") -> str:
+    """Compact text of a tool result for the LLM, within the result budget.
+
+    The state keeps the full results; the model gets the items most relevant
+    to the tool's query, without metadata it does not need.
+    """
+    if not isinstance(result, list):
+        return truncate(str(result), TOOL_RESULT_TOKEN_BUDGET)
+
+    items = []
+    for item in result:
+        if isinstance(item, Document):
+            items.append(f"[{item.metadata.get('filename', '')}] {item.page_content}")
+        elif isinstance(item, dict):
+            fields = {
+                key: item[key]
+                for key in ("title", "snippet", "link", "image")
+                if key in item
+            }
+            items.append(json.dumps(fields or item))
+        else:
+            items.append(str(item))
+
+    packed = pack(
+        items,
+        TOOL_RESULT_TOKEN_BUDGET,
+        query,
+        item_tokens=TOOL_RESULT_TOKEN_BUDGET // 3,
+    )
+    if len(packed) < len(items):
+        packed.append(f"({len(items) - len(packed)} more results omitted)")
+    return "\n".join(packed)
+
+
+def message_tokens(message: BaseMessage) -> int:
+    tokens = estimate_tokens(str(message.content))
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(json.dumps(tool_call["args"]))
+    return tokens
+
+
+def fit_history(messages: List[BaseMessage], max_tokens: int) -> List[BaseMessage]:
+    """A message history within max_tokens, for the next LLM call.
+
+    The state keeps the full history. Tool results are emptied oldest first
+    until the rest fits; they stay in place because every tool call needs
+    its result, and the latest round is what the model reasons about.
+    """
+    total = sum(message_tokens(message) for message in messages)
+    fitted = list(messages)
+    for i, message in enumerate(messages):
+        if total <= max_tokens:
+            break
+        if isinstance(message, ToolMessage) and message.content != OMITTED_RESULT:
+            total -= message_tokens(message) - estimate_tokens(OMITTED_RESULT)
+            fitted[i] = message.model_copy(update={"content": OMITTED_RESULT})
+    return fitted
+
+
+# Two graph steps per research round plus the UI stages; the budget, not the
+# recursion limit, is what ends the research loop
+RECURSION_LIMIT = 2 * BUDGET["max_research_rounds"] + 10
+
+
+def token_usage(message: BaseMessage) -> int:
+    """Tokens reported for an LLM response, 0 when the model reports none."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+def time_left(state: AgentState) -> float:
+    """Seconds left before the request deadline, negative once it has passed."""
+    return state["deadline"] - time.monotonic()
+
+
+def research_time_left(state: AgentState) -> float:
+    """Seconds research may still take before the UI reserve is reached."""
+    return time_left(state) - BUDGET["ui_time_reserve"]
+
+
+# Error the fallback UI reports when UI generation runs out of time
+DEADLINE_ERROR = "UI generation ran past the request deadline"
+
+
+def source_count(knowledge: KnowledgeState) -> int:
+    """Distinct web results and document excerpts gathered so far."""
+    links = {
+        result.get("link") or result.get("snippet") for result in knowledge["search"]
+    }
+    excerpts = {doc.page_content for doc in knowledge["docs"]}
+    return len(links) + len(excerpts)
+
+
+def research_stop_reason(state: AgentState) -> Optional[str]:
+    """Why research should hand over to UI design now, None to continue."""
+    if state.get("iteration_count", 0) >= BUDGET["max_research_rounds"]:
+        return "max rounds reached"
+    if source_count(state["knowledge"]) >= BUDGET["enough_sources"]:
+        return "enough sources gathered"
+    if research_time_left(state) <= 0:
+        return "deadline near"
+    if state.get("tokens_used", 0) >= BUDGET["max_tokens"] - BUDGET["ui_token_reserve"]:
+        return "token budget spent"
+    if state.get("tool_calls_used", 0) >= BUDGET["max_tool_calls"]:
+        return "tool call budget spent"
+    return None
+
+
+def split_tool_calls(state: AgentState, tool_calls: List[Dict[str, Any]]):
+    """Tool calls within the remaining budget, and the ones to skip."""
+    remaining = max(0, BUDGET["max_tool_calls"] - state.get("tool_calls_used", 0))
+    return tool_calls[:remaining], tool_calls[remaining:]
+
+
+def skipped_tool_messages(tool_calls: List[Dict[str, Any]]) -> List[ToolMessage]:
+    # Every tool call needs an answer for the conversation to stay valid
+    return [
+        ToolMessage(
+            content="Skipped: tool call budget exhausted",
+            name=tool_call["name"],
+            tool_call_id=tool_call["id"],
+        )
+        for tool_call in tool_calls
+    ]
+
+
+async def run_tool_calls(
+    tool_calls: List[Dict[str, Any]],
+    tools_by_name: Dict[str, Any],
+    timeout: float = TOOL_TIMEOUT,
+) -> List[Any]:
+    """Run the tool calls of one message concurrently.
+
+    Each call gets its own timeout. Results are returned in tool call order so
+    merging them into the state stays reproducible.
+    """
+
+    async def run_tool_call(tool_call: Dict[str, Any]) -> Any:
+        tool_name = tool_call["name"]
+        tool_args = tool_call["args"]
+
+        if tool_name not in tools_by_name:
+            logging.warning(f"Unknown tool requested: {tool_name}")
+            return f"Unknown tool: {tool_name}"
+
+        try:
+            # wait_for cancels the tool call when it times out
+            result = await asyncio.wait_for(
+                tools_by_name[tool_name].ainvoke(tool_args), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            logging.warning(f"Tool '{tool_name}' timed out after {timeout:.1f}s")
+            return []
+        except Exception as e:
+            logging.warning(f"Tool '{tool_name}' failed: {e}")
+            return []
+
+        logging.info(
+            f"Tool '{tool_name}' executed with args: {tool_args}, result length: {len(result) if isinstance(result, list) else 'N/A'}"
+        )
+        return result
+
+    return await asyncio.gather(*(run_tool_call(tc) for tc in tool_calls))
 
 
 # Custom tool node that updates knowledge state
-def custom_tool_node(state: AgentState) -> Dict[str, Any]:
+async def custom_tool_node(state: AgentState) -> Dict[str, Any]:
     """Execute tools and update knowledge state."""
-    # Initialize knowledge if not present
-    if "knowledge" not in state:
-        state["knowledge"] = {
-            "docs": [],
-            "search": [],
-            "images": [],
-            "ui_images": [],
-            "generated_images": {},
-        }
-
     # Get the last message (should contain tool calls)
     last_message = state["messages"][-1]
 
     if hasattr(last_message, "tool_calls") and last_message.tool_calls:
-        tool_outputs = []
+        tools_by_name = {
+            "web_search_tool_fn": web_search_tool_fn,
+            "image_search_tool_fn": image_search_tool_fn,
+            "rag_search_tool_fn": rag_search_tool_fn,
+        }
+        # Knowledge field each research tool contributes to
+        knowledge_keys = {
+            "web_search_tool_fn": "search",
+            "image_search_tool_fn": "images",
+            "rag_search_tool_fn": "docs",
+        }
 
-        for tool_call in last_message.tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-
-            # Execute the tool
-            if tool_name == "web_search_tool_fn":
-                result = web_search_tool_fn.invoke(tool_args)
-                state["knowledge"]["search"].extend(result)
-            elif tool_name == "image_search_tool_fn":
-                result = image_search_tool_fn.invoke(tool_args)
-                state["knowledge"]["images"].extend(result)
-            elif tool_name == "rag_search_tool_fn":
-                result = rag_search_tool_fn.invoke(tool_args)
-                state["knowledge"]["docs"].extend(result)
-
-            logging.info(
-                f"Tool '{tool_name}' executed with args: {tool_args}, result length: {len(result) if isinstance(result, list) else 'N/A'}"
+        calls, skipped = split_tool_calls(state, last_message.tool_calls)
+
+        # Scope RAG searches to the requesting user
+        tool_calls = [
+            {
+                **tool_call,
+                "args": {
+                    **tool_call["args"],
+                    "user_id": state.get("user_id", "anonymous"),
+                    "k": state.get("rag_k"),
+                },
+            }
+            if tool_call["name"] == "rag_search_tool_fn"
+            else tool_call
+            for tool_call in calls
+        ]
+
+        # Embed all of this turn's RAG queries in one call up front
+        rag_queries = [
+            tool_call["args"].get("query", "")
+            for tool_call in tool_calls
+            if tool_call["name"] == "rag_search_tool_fn"
+        ]
+        if len(rag_queries) > 1:
+            await rag_manager.aprefetch_query_embeddings(
+                rag_queries, state.get("user_id", "anonymous")
             )
 
+        # Tools may not eat into the time reserved for UI generation
+        timeout = max(1.0, min(TOOL_TIMEOUT, research_time_left(state)))
+        results = await run_tool_calls(tool_calls, tools_by_name, timeout)
+
+        knowledge = {key: [] for key in knowledge_keys.values()}
+        tool_outputs = []
+        for tool_call, result in zip(calls, results):
+            tool_name = tool_call["name"]
+            if tool_name in knowledge_keys and isinstance(result, list):
+                knowledge[knowledge_keys[tool_name]].extend(result)
+
             # Create tool message
             tool_outputs.append(
                 ToolMessage(
-                    content=str(result),
+                    content=tool_result_text(
+                        result, tool_call["args"].get("query", "")
+                    ),
                     name=tool_name,
                     tool_call_id=tool_call["id"],
                 )
             )
 
+        # Only return the delta, the reducers append it to the state
         return {
-            **state,
-            "messages": state["messages"] + tool_outputs,
+            "messages": tool_outputs + skipped_tool_messages(skipped),
+            "knowledge": knowledge,
+            "tool_calls_used": len(calls),
         }
 
-    return state
+    return {}
+
+
+async def imagen_disabled_tool(tool_args: Dict[str, Any]) -> str:
+    # Imagen disabled to prevent token overflow
+    return "Image generation disabled - use ui_image_search_tool_fn instead"
 
 
 # UI tool node that updates UI-specific knowledge
-def ui_tool_node(state: AgentState) -> Dict[str, Any]:
+async def ui_tool_node(state: AgentState) -> Dict[str, Any]:
     """Execute UI tools and update knowledge state."""
-    # Initialize knowledge if not present
-    if "knowledge" not in state:
-        state["knowledge"] = {
-            "docs": [],
-            "search": [],
-            "images": [],
-            "ui_images": [],
-            "generated_images": {},
-        }
-
     # Get the last UI message (should contain tool calls)
     last_message = state["ui_messages"][-1]
 
     if hasattr(last_message, "tool_calls") and last_message.tool_calls:
-        tool_outputs = []
+        tools_by_name = {
+            "ui_image_search_tool_fn": ui_image_search_tool_fn,
+            "imagen_generate_tool_fn": imagen_generate_tool_fn
+            if IMAGE_GENERATION
+            else RunnableLambda(imagen_disabled_tool),
+        }
 
-        for tool_call in last_message.tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-
-            # Execute the tool
-            if tool_name == "ui_image_search_tool_fn":
-                result = ui_image_search_tool_fn.invoke(tool_args)
-                state["knowledge"]["ui_images"].extend(result)
-            elif tool_name == "imagen_generate_tool_fn":
-                # Imagen disabled to prevent token overflow
-                result = (
-                    "Image generation disabled - use ui_image_search_tool_fn instead"
-                )
+        calls, skipped = split_tool_calls(state, last_message.tool_calls)
+        timeout = max(1.0, min(TOOL_TIMEOUT, time_left(state)))
+        results = await run_tool_calls(calls, tools_by_name, timeout)
 
-            logging.info(f"UI Tool '{tool_name}' executed with args: {tool_args}")
+        ui_images = []
+        generated_images = {}
+        tool_outputs = []
+        for tool_call, result in zip(calls, results):
+            tool_name = tool_call["name"]
+            if tool_name == "ui_image_search_tool_fn" and isinstance(result, list):
+                ui_images.extend(result)
+            elif tool_name == "imagen_generate_tool_fn" and isinstance(result, str):
+                # Only the handle is kept, the image is attached at the end
+                for handle in PLACEHOLDER.findall(result):
+                    generated_images[handle] = tool_call["args"].get("prompt", "")
 
             # Create tool message
             tool_outputs.append(
                 ToolMessage(
-                    content=str(result),
+                    content=tool_result_text(
+                        result, tool_call["args"].get("query", "")
+                    ),
                     name=tool_name,
                     tool_call_id=tool_call["id"],
                 )
             )
 
         return {
-            **state,
-            "ui_messages": state["ui_messages"] + tool_outputs,
+            "ui_messages": tool_outputs + skipped_tool_messages(skipped),
+            "knowledge": {
+                "ui_images": ui_images,
+                "generated_images": generated_images,
+            },
+            "tool_calls_used": len(calls),
         }
 
-    return state
+    return {}
 
 
 # Research Agent - consolidates RAG, web search, and image search
-def research_agent_node(state: AgentState) -> Dict[str, Any]:
+async def research_agent_node(state: AgentState) -> Dict[str, Any]:
     """Research agent that uses tools to gather knowledge and updates state."""
     logging.info("Research agent processing request")
 
-    # Initialize knowledge if not present
-    if "knowledge" not in state:
-        state["knowledge"] = {
-            "docs": [],
-            "search": [],
-            "images": [],
-            "ui_images": [],
-            "generated_images": {},
-        }
-
-    # Initialize iteration count if not present
-    if "iteration_count" not in state:
-        state["iteration_count"] = 0
-
-    # Increment iteration count
-    state["iteration_count"] += 1
+    # Hand over to UI design once the budget is spent or enough is known.
+    # Returning no message leaves a tool result last, which ends the loop.
+    reason = research_stop_reason(state)
+    if reason:
+        logging.info(f"Research stopped ({reason}), proceeding to UI generation")
+        return {}
 
-    # Stop after 3 iterations to prevent infinite loops
-    if state["iteration_count"] > 3:
-        logging.info("Max iterations reached, proceeding to UI generation")
-        return {**state}
+    iteration_count = state.get("iteration_count", 0) + 1
 
     # Call LLM with tools - it will decide which tools to use
-    response = research_llm_with_tools.invoke(state["messages"])
-
-    # Update messages with the LLM response
-    updated_messages = state["messages"] + [response]
+    try:
+        response = await asyncio.wait_for(
+            research_llm_with_tools.ainvoke(
+                fit_history(state["messages"], RESEARCH_TOKEN_BUDGET)
+            ),
+            timeout=max(1.0, research_time_left(state)),
+        )
+    except asyncio.TimeoutError:
+        logging.warning("Research LLM call ran past the deadline, proceeding")
+        return {"iteration_count": iteration_count}
+
+    # Only return the new message, the reducer appends it to the history
+    return {
+        "messages": [response],
+        "iteration_count": iteration_count,
+        "tokens_used": token_usage(response),
+    }
+
+
+# Research condition checker for tool routing. Same as langgraph's prebuilt
+# tools_condition, which is avoided because langgraph.prebuilt takes seconds
+# to import.
+def tools_condition(state: AgentState):
+    """Check if research tools should be called."""
+    last_message = state["messages"][-1]
 
-    return {**state, "messages": updated_messages}
+    # Check if the last message has tool calls
+    if hasattr(last_message, "tool_calls") and last_message.tool_calls:
+        return "tools"
+    else:
+        return END
 
 
 # UI condition checker for tool routing
@@ -215,72 +536,127 @@ def ui_tools_condition(state: AgentState):
 
     # Check if the last message has tool calls
     if hasattr(last_message, "tool_calls") and last_message.tool_calls:
+        if time.monotonic() >= state["deadline"]:
+            logging.info("Deadline passed, skipping UI tools")
+            return END
+        # One round of tools, then the designer has to write its plan
+        if any(isinstance(m, ToolMessage) for m in state["ui_messages"]):
+            logging.info("UI tools already used, skipping further tool calls")
+            return END
         return "ui_tools"
     else:
         return END
 
 
-# UI Designer Agent - Creates a creative design plan with tool support
-async def ui_designer_node(state: AgentState):
-    """UI Designer creates a comprehensive design plan with visual assets."""
-    logging.info("UI Designer creating design plan")
+# Design themes, one is picked at random per request
+THEMES = [
+    "modern",
+    "minimalist",
+    "vibrant",
+    "professional",
+    "creative",
+    "elegant",
+    "playful",
+    "dark",
+    "light",
+    "colorful",
+]
+
+
+def pick_style(state: AgentState):
+    """Theme and creative seed of a request, random unless already set."""
+    theme = state.get("theme") or random.choice(THEMES)
+    layout_seed = state.get("layout_seed") or random.randint(1, 100)
+    return theme, layout_seed
 
-    prompt = state["prompt"]
-    docs = state["knowledge"]["docs"]
-    search_results = state["knowledge"]["search"]
-    image_results = state["knowledge"]["images"]
 
-    # Initialize UI messages if not present
-    if "ui_messages" not in state:
-        state["ui_messages"] = []
+def research_context(knowledge: KnowledgeState, query: str, max_tokens: int):
+    """Search, image and document summaries for the UI prompts.
+
+    Each section gets a share of max_tokens and is filled with the items
+    most relevant to the query.
+    """
+    docs = knowledge["docs"]
+    search_results = knowledge["search"]
+    image_results = knowledge["images"]
+    budgets = split_budget(max(0, max_tokens), CONTEXT_WEIGHTS)
 
     # Prepare context for design planning
     search_context = ""
     if search_results:
-        for i, result in enumerate(search_results[:5]):
-            search_context += f"Result {i + 1}: Title: {result.get('title', '')}, Snippet: {result.get('snippet', '')}\n"
+        items = [
+            f"Title: {result.get('title', '')}, Snippet: {result.get('snippet', '')}"
+            for result in search_results
+        ]
+        for i, item in enumerate(
+            pack(items, budgets["search"], query, item_tokens=150, overhead=5)
+        ):
+            search_context += f"Result {i + 1}: {item}\n"
 
     image_context = ""
     if image_results:
-        for i, img in enumerate(image_results[:6]):
-            image_context += (
-                f"Image {i + 1}: {img.get('title', '')} - {img.get('image', '')}\n"
-            )
+        # Titles are shortened, URLs must stay whole
+        items = [
+            f"{truncate(img.get('title', ''), 20)} - {img.get('image', '')}"
+            for img in image_results
+        ]
+        for i, item in enumerate(pack(items, budgets["images"], query, overhead=5)):
+            image_context += f"Image {i + 1}: {item}\n"
 
     # Prepare RAG context summary
     rag_summary = ""
     if docs:
-        rag_summary = f"\nEDUCATIONAL MATERIALS AVAILABLE ({len(docs)} excerpts):\n"
-        for i, doc in enumerate(docs[:3]):
-            filename = doc.metadata.get("filename", "Unknown")
-            preview = (
-                doc.page_content[:150] + "..."
-                if len(doc.page_content) > 150
-                else doc.page_content
+        items = [
+            f"- {doc.metadata.get('filename', 'Unknown')}: {doc.page_content}"
+            for doc in docs
+        ]
+        excerpts = pack(items, budgets["docs"], query, item_tokens=250)
+        if excerpts:
+            rag_summary = (
+                f"\nEDUCATIONAL MATERIALS AVAILABLE ({len(docs)} excerpts):\n"
+                + "\n".join(excerpts)
+                + "\n"
             )
-            rag_summary += f"- {filename}: {preview}\n"
-
-    # Add creativity elements
-    themes = [
-        "modern",
-        "minimalist",
-        "vibrant",
-        "professional",
-        "creative",
-        "elegant",
-        "playful",
-        "dark",
-        "light",
-        "colorful",
-    ]
-    selected_theme = random.choice(themes)
-    layout_seed = random.randint(1, 100)
 
-    design_prompt = f"""You are a world-class UI/UX Designer creating innovative, beautiful user experiences. Your job is to create a comprehensive DESIGN PLAN (not final components yet).
+    return search_context, image_context, rag_summary
+
+
+IMAGEN_TOOL_HINT = "2. imagen_generate_tool_fn - Generate a custom image (at most 2); it returns a [GENERATED_IMAGE:...] handle to use in the plan wherever the image belongs"
+
+
+# UI Designer Agent - Creates a creative design plan with tool support
+async def ui_designer_node(state: AgentState):
+    """UI Designer creates a comprehensive design plan with visual assets."""
+    logging.info("UI Designer creating design plan")
+
+    # Back from the tools, the plan is written with their results in view
+    if state.get("ui_messages"):
+        try:
+            response = await asyncio.wait_for(
+                ui_llm_plan.ainvoke(
+                    fit_history(
+                        state["ui_messages"],
+                        PROMPT_TOKEN_BUDGET + TOOL_RESULT_TOKEN_BUDGET,
+                    )
+                ),
+                timeout=time_left(state),
+            )
+        except asyncio.TimeoutError:
+            logging.warning(
+                "UI design ran past the deadline, continuing without a plan"
+            )
+            return {}
+        return {"ui_messages": [response], "tokens_used": token_usage(response)}
+
+    prompt = truncate(state["prompt"], MAX_USER_PROMPT_TOKENS)
+    selected_theme, layout_seed = pick_style(state)
+
+    def build_prompt(search_context="", image_context="", rag_summary=""):
+        return f"""You are a world-class UI/UX Designer creating innovative, beautiful user experiences. Your job is to create a comprehensive DESIGN PLAN (not final components yet).
 
 AVAILABLE TOOLS FOR VISUAL ENHANCEMENT:
 1. ui_image_search_tool_fn - Search for UI inspiration images and visual assets
-
+{IMAGEN_TOOL_HINT if IMAGE_GENERATION else ""}
 USER REQUEST: "{prompt}"
 DESIGN THEME: {selected_theme}
 CREATIVE SEED: {layout_seed}
@@ -325,36 +701,56 @@ If you use tools, execute them first, then create your comprehensive design plan
 Output your design plan as clear, detailed text (not JSON).
 """
 
-    # Call UI LLM with tools - it will decide which tools to use first
-    response = ui_llm_with_tools.invoke([HumanMessage(content=design_prompt)])
+    # The research context gets what the instructions leave of the budget
+    context_budget = PROMPT_TOKEN_BUDGET - estimate_tokens(build_prompt())
+    design_prompt = build_prompt(
+        *research_context(state["knowledge"], prompt, context_budget)
+    )
 
-    # Update UI messages with the LLM response
-    ui_messages = state["ui_messages"] + [HumanMessage(content=design_prompt), response]
+    # Call UI LLM with tools - it will decide which tools to use first
+    prompt_message = HumanMessage(content=design_prompt)
+    ui_messages, tokens_used = [prompt_message], 0
+    try:
+        response = await asyncio.wait_for(
+            ui_llm_with_tools.ainvoke([prompt_message]), timeout=time_left(state)
+        )
+        ui_messages.append(response)
+        tokens_used = token_usage(response)
+    except asyncio.TimeoutError:
+        # Without a plan the implementer falls back to the placeholder UI
+        logging.warning("UI design ran past the deadline, continuing without a plan")
 
-    return {**state, "ui_messages": ui_messages}
+    # Only return the new UI messages, the reducer appends them
+    return {
+        "ui_messages": ui_messages,
+        "theme": selected_theme,
+        "layout_seed": layout_seed,
+        "tokens_used": tokens_used,
+    }
 
 
 # Extract design plan from UI messages
-def extract_design_plan_node(state: AgentState) -> Dict[str, Any]:
+async def extract_design_plan_node(state: AgentState) -> Dict[str, Any]:
     """Extract the design plan from UI Designer's response."""
     logging.info("Extracting design plan from UI Designer")
 
     if "ui_messages" in state and state["ui_messages"]:
-        # Get the last AI message which should contain the design plan
+        # Get the last AI message with text, tool calls alone are no plan
         for message in reversed(state["ui_messages"]):
-            if hasattr(message, "content") and message.content:
-                # Store the design plan in state
-                return {**state, "design_plan": message.content}
+            if isinstance(message, AIMessage) and isinstance(message.content, str):
+                if message.content.strip():
+                    # Store the design plan in state
+                    return {"design_plan": message.content}
 
     # Fallback if no design plan found
-    return {**state, "design_plan": "No design plan available"}
+    return {"design_plan": "No design plan available"}
 
 
 async def ui_implementer_node(state: AgentState):
     """UI Implementer converts the design plan to final JSON components."""
     logging.info("UI Implementer creating final components")
 
-    prompt = state["prompt"]
+    prompt = truncate(state["prompt"], MAX_USER_PROMPT_TOKENS)
     design_plan = state.get("design_plan", "")
     ui_images = state["knowledge"]["ui_images"]
     generated_images = state["knowledge"]["generated_images"]
@@ -362,17 +758,6 @@ async def ui_implementer_node(state: AgentState):
     search_results = state["knowledge"]["search"]
     image_results = state["knowledge"]["images"]
 
-    # Helper function to map image prompts back to actual image data
-    def resolve_image_reference(image_ref: str) -> str:
-        """Resolve image reference to actual image data or URL."""
-        # Check if it's a generated image prompt
-        if image_ref in generated_images:
-            # Don't return large base64 data - just return a placeholder
-            # The actual image data will be resolved later in post-processing
-            return f"[GENERATED_IMAGE:{image_ref}]"
-        # Otherwise return as-is (could be a URL from search results)
-        return image_ref
-
     # Prepare context summaries for reference
     search_summary = ""
     if search_results:
@@ -388,52 +773,29 @@ async def ui_implementer_node(state: AgentState):
     else:
         image_summary = "No images available (may be due to rate limiting) - components can use empty image fields"
 
-    ui_image_context = ""
-    if ui_images:
-        for i, img in enumerate(ui_images[:4]):
-            ui_image_context += f"UI Inspiration {i + 1}: {img.get('title', '')} - {img.get('image', '')}\n"
-
-    generated_image_context = ""
-    if generated_images:
-        available_prompts = list(generated_images.keys())
-        for i, prompt in enumerate(available_prompts):
-            generated_image_context += (
-                f"Generated Image {i + 1}: '{prompt}' (reference as: {prompt})\n"
-            )
-
     rag_summary = ""
     if docs:
         rag_summary = f"Educational Materials: {len(docs)} excerpts available"
 
-    # Truncate design plan if too long to prevent token overflow
-    max_design_plan_length = 10000  # Reasonable limit for design plan
-    truncated_design_plan = design_plan
-    if len(design_plan) > max_design_plan_length:
-        logging.warning(
-            f"Design plan too long ({len(design_plan)} chars), truncating to {max_design_plan_length} chars"
-        )
-        truncated_design_plan = (
-            design_plan[:max_design_plan_length] + "\n[... truncated for brevity ...]"
-        )
-
-    implementation_prompt = f"""You are a UI Implementation Specialist. Your job is to convert the design plan into exact JSON components.
+    def build_prompt(design_plan="", ui_image_context="", generated_image_context=""):
+        return f"""You are a UI Implementation Specialist. Your job is to convert the design plan into exact JSON components.
 
 ORIGINAL USER REQUEST: "{prompt}"
 
 DESIGN PLAN TO IMPLEMENT:
-{truncated_design_plan}
+{design_plan}
 
 AVAILABLE ASSETS:
 {search_summary}
 {image_summary}
 {rag_summary}
 
-UI INSPIRATION IMAGES:
-{ui_image_context if ui_image_context else "No UI inspiration images"}
-
 SEARCHED IMAGES (use URLs from ui_image_search_tool_fn results):
 {ui_image_context if ui_image_context else "No UI inspiration images found (may be due to rate limiting) - proceed without them"}
 
+GENERATED IMAGES (use the [GENERATED_IMAGE:...] reference as the image URL):
+{generated_image_context if generated_image_context else "No generated images"}
+
 IMPLEMENTATION REQUIREMENTS:
 1. Follow the design plan exactly as specified
 2. Create 3-5 components using DIFFERENT types for variety
@@ -454,121 +816,306 @@ Return ONLY a valid JSON object (no markdown, no explanations):
 }}
 
 COMPONENT SPECIFICATIONS:
-hero: {{"title": "string", "subtitle": "string", "image": "url_or_empty", "buttonText": "string", "buttonLink": "url_or_empty"}}
-card: {{"title": "string", "content": "string", "image": "url_or_empty", "badge": "string_or_empty"}}
-gallery: {{"title": "string", "images": [{{"url": "image_url", "caption": "string"}}]}}
-list: {{"title": "string", "items": [{{"text": "string", "icon": "emoji"}}]}}
-stats: {{"title": "string", "data": [{{"value": "string", "label": "string", "icon": "emoji"}}]}}
-testimonial: {{"quote": "string", "author": "string", "role": "string", "avatar": "url_or_empty"}}
+{component_specs_text()}
 """
 
+    budgets = split_budget(
+        max(0, PROMPT_TOKEN_BUDGET - estimate_tokens(build_prompt())),
+        {"plan": 0.75, "ui_images": 0.15, "generated": 0.1},
+    )
+
+    ui_image_context = ""
+    items = [
+        f"{truncate(img.get('title', ''), 20)} - {img.get('image', '')}"
+        for img in ui_images
+    ]
+    for i, item in enumerate(pack(items, budgets["ui_images"], prompt, overhead=6)):
+        ui_image_context += f"UI Inspiration {i + 1}: {item}\n"
+
+    generated_image_context = ""
+    items = [
+        f"'{truncate(image_prompt, 30)}' (reference as: [GENERATED_IMAGE:{handle}])"
+        for handle, image_prompt in generated_images.items()
+    ]
+    for i, item in enumerate(pack(items, budgets["generated"], overhead=5)):
+        generated_image_context += f"Generated Image {i + 1}: {item}\n"
+
+    # Cut the design plan to its share of the budget
+    truncated_design_plan = truncate(design_plan, budgets["plan"])
+    if truncated_design_plan != design_plan:
+        logging.warning(
+            f"Design plan too long ({estimate_tokens(design_plan)} tokens), "
+            f"truncating to {budgets['plan']} tokens"
+        )
+
+    implementation_prompt = build_prompt(
+        truncated_design_plan, ui_image_context, generated_image_context
+    )
+
     try:
-        response = ui_llm.invoke([HumanMessage(content=implementation_prompt)])
-        content = response.content.strip()
-
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.endswith("```"):
-            content = content[:-3]
-        content = content.strip()
-
-        ui_components = json.loads(content)
-
-        # Post-process components to resolve image references (final resolution)
-        def resolve_final_images(component):
-            """Recursively resolve placeholder image references to actual image data."""
-            if isinstance(component, dict):
-                for key, value in component.items():
-                    if key == "image" and isinstance(value, str):
-                        if value.startswith("[GENERATED_IMAGE:") and value.endswith(
-                            "]"
-                        ):
-                            # Extract the prompt from the placeholder
-                            prompt = value[17:-1]  # Remove "[GENERATED_IMAGE:" and "]"
-                            if prompt in generated_images:
-                                component[key] = generated_images[prompt]
-                            else:
-                                component[key] = ""  # Fallback to empty if not found
-                    elif key == "images" and isinstance(value, list):
-                        for img_item in value:
-                            if isinstance(img_item, dict) and "url" in img_item:
-                                url_value = img_item["url"]
-                                if url_value.startswith(
-                                    "[GENERATED_IMAGE:"
-                                ) and url_value.endswith("]"):
-                                    prompt = url_value[17:-1]
-                                    if prompt in generated_images:
-                                        img_item["url"] = generated_images[prompt]
-                                    else:
-                                        img_item["url"] = ""
-                    elif key == "avatar" and isinstance(value, str):
-                        if value.startswith("[GENERATED_IMAGE:") and value.endswith(
-                            "]"
-                        ):
-                            prompt = value[17:-1]
-                            if prompt in generated_images:
-                                component[key] = generated_images[prompt]
-                            else:
-                                component[key] = ""
-                    elif isinstance(value, (dict, list)):
-                        resolve_final_images(value)
-            elif isinstance(component, list):
-                for item in component:
-                    resolve_final_images(item)
-
-        # Resolve all image placeholders to actual image data
-        resolve_final_images(ui_components)
+        response = await asyncio.wait_for(
+            ui_llm.ainvoke([HumanMessage(content=implementation_prompt)]),
+            timeout=time_left(state),
+        )
+        components, repair_tokens = await collect_components(
+            response.content, state["deadline"]
+        )
+        ui_components = {"components": components}
 
         return {
-            **state,
             "final_ui": ui_components,
-            "messages": state["messages"]
-            + [
+            "tokens_used": token_usage(response) + repair_tokens,
+            "messages": [
                 AIMessage(
                     content="UI components implemented successfully from design plan"
                 )
             ],
         }
 
+    except asyncio.TimeoutError:
+        logging.warning("UI implementation ran past the deadline, using fallback")
+        return implementation_fallback(TimeoutError(DEADLINE_ERROR))
+
     except Exception as e:
         logging.error(f"UI Implementer error: {e}")
-        # Fallback UI
-        fallback_ui = {
-            "components": [
-                {
-                    "type": "card",
-                    "props": {
-                        "title": "Design Implementation",
-                        "content": "UI generated based on creative design plan with AI-powered enhancements.",
-                        "badge": "AI Designed",
-                    },
-                }
-            ]
-        }
+        return implementation_fallback(e)
+
+
+def implementation_fallback(e: Exception) -> Dict[str, Any]:
+    """State update with a placeholder UI when the components cannot be built."""
+    ui_output_stats["fallbacks"] += 1
+    fallback_ui = {
+        "components": [
+            {
+                "type": "card",
+                "props": {
+                    "title": "Design Implementation",
+                    "content": "UI generated based on creative design plan with AI-powered enhancements.",
+                    "badge": "AI Designed",
+                },
+            }
+        ],
+        "error": str(e),
+    }
+    return {
+        "final_ui": fallback_ui,
+        "messages": [
+            AIMessage(content=f"UI implementation failed, using fallback: {str(e)}")
+        ],
+    }
+
+
+# Components per UI, the repair re-ask asks for the ones still missing
+MAX_COMPONENTS = 5
+
+# Tag of repair LLM calls, so their tokens are not streamed as components
+REPAIR_TAG = "component_repair"
+
+# Components kept, rejected and repaired across UI generations
+ui_output_stats = {"components": 0, "rejected": 0, "repairs": 0, "fallbacks": 0}
+
+
+async def collect_components(
+    content: str, deadline: float
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Valid components of a UI generation, and the tokens spent on repair.
+
+    Components are parsed one by one, keeping every valid one. If the output
+    broke off or some components were invalid, the model is re-asked for the
+    broken part only, not the whole UI, as long as the deadline allows.
+    Raises ValueError if no component could be recovered.
+    """
+    parser = ComponentStreamParser()
+    parser.feed(content)
+    components = list(parser.components)
+    ui_output_stats["rejected"] += len(parser.rejected)
+
+    repair_tokens = 0
+    if not parser.complete and len(components) < MAX_COMPONENTS:
+        ui_output_stats["repairs"] += 1
+        broken = parser.rejected + ([] if parser.done else [parser.tail])
+        logging.warning(
+            f"UI output broken after {len(components)} valid components, "
+            f"re-asking for the rest"
+        )
+        try:
+            response = await asyncio.wait_for(
+                ui_llm.ainvoke(
+                    [HumanMessage(content=repair_prompt(components, broken))],
+                    config={"tags": [REPAIR_TAG]},
+                ),
+                timeout=deadline - time.monotonic(),
+            )
+            repair_tokens = token_usage(response)
+            repair = ComponentStreamParser()
+            repair.feed(response.content)
+            components += repair.components[: MAX_COMPONENTS - len(components)]
+        except asyncio.TimeoutError:
+            logging.warning("Component repair ran past the deadline, skipping it")
+        except Exception as e:
+            logging.warning(f"Component repair failed: {e}")
+
+    if not components:
+        raise ValueError("No valid components in the UI output")
+    ui_output_stats["components"] += len(components)
+    return components, repair_tokens
+
+
+def repair_prompt(components: List[Dict[str, Any]], broken: List[str]) -> str:
+    """Prompt asking for replacements of the broken part of a UI output."""
+    kept = "\n".join(
+        f"- {component['type']}: {truncate(json.dumps(component['props']), 30)}"
+        for component in components
+    )
+
+    def build_prompt(broken_text=""):
+        return f"""Part of your UI JSON output was invalid or cut off. These components were kept:
+{kept if kept else "None"}
+
+This part could not be used:
+{broken_text}
+
+Rewrite ONLY the broken part as complete, valid components, without repeating the kept ones (at most {MAX_COMPONENTS - len(components)}).
+
+Return ONLY a valid JSON object (no markdown, no explanations):
+{{"components": [{{"type": "component_name", "props": {{}}}}]}}
+
+COMPONENT SPECIFICATIONS:
+{component_specs_text()}
+"""
+
+    # The broken parts share what the rest of the prompt leaves of the budget
+    budget = max(0, PROMPT_TOKEN_BUDGET - estimate_tokens(build_prompt()))
+    parts = pack(
+        [text.strip() for text in broken],
+        budget,
+        item_tokens=max(1, budget // max(1, len(broken)) - 2),
+        overhead=2,
+    )
+    return build_prompt("\n---\n".join(parts))
+
+
+# Fast mode - design and implementation in a single structured-output call
+async def ui_fast_node(state: AgentState) -> Dict[str, Any]:
+    """Write the final components straight from the research, without a plan."""
+    logging.info("UI fast mode creating final components")
+
+    prompt = truncate(state["prompt"], MAX_USER_PROMPT_TOKENS)
+    selected_theme, layout_seed = pick_style(state)
+
+    def build_prompt(search_context="", image_context="", rag_summary=""):
+        return f"""You are a world-class UI/UX Designer. Turn the research below into a complete, engaging UI made of JSON components.
+
+USER REQUEST: "{prompt}"
+DESIGN THEME: {selected_theme}
+CREATIVE SEED: {layout_seed}
+
+RESEARCH CONTEXT:
+{search_context if search_context else "No search results - use your knowledge"}
+
+AVAILABLE IMAGES:
+{image_context if image_context else "No images available"}
+
+{rag_summary}
+
+REQUIREMENTS:
+1. Create 3-5 components using DIFFERENT types for variety
+2. Apply the {selected_theme} theme consistently and use the creative seed {layout_seed} for unique layout decisions
+3. Integrate the research findings and educational materials into the content
+4. For images, use URLs from the available images or leave empty
+5. Make titles concise (max 60 chars) and content readable (max 200 chars for cards)
+6. Only fill the props of each component's type
+
+COMPONENT SPECIFICATIONS:
+{component_specs_text()}
+"""
+
+    context_budget = PROMPT_TOKEN_BUDGET - estimate_tokens(build_prompt())
+    fast_prompt = build_prompt(
+        *research_context(state["knowledge"], prompt, context_budget)
+    )
+
+    try:
+        result = await asyncio.wait_for(
+            fast_ui_llm.ainvoke([HumanMessage(content=fast_prompt)]),
+            timeout=time_left(state),
+        )
+        # Parsed from the raw text, so valid components survive a broken tail
+        components, repair_tokens = await collect_components(
+            result["raw"].content, state["deadline"]
+        )
         return {
-            **state,
-            "final_ui": fallback_ui,
-            "messages": state["messages"]
-            + [
-                AIMessage(content=f"UI implementation failed, using fallback: {str(e)}")
-            ],
+            "final_ui": {"components": components},
+            "theme": selected_theme,
+            "layout_seed": layout_seed,
+            "tokens_used": token_usage(result["raw"]) + repair_tokens,
+            "messages": [AIMessage(content="UI components generated in fast mode")],
         }
 
+    except asyncio.TimeoutError:
+        logging.warning("UI fast mode ran past the deadline, using fallback")
+        fallback = implementation_fallback(TimeoutError(DEADLINE_ERROR))
+
+    except Exception as e:
+        logging.error(f"UI fast mode error: {e}")
+        fallback = implementation_fallback(e)
+
+    return {**fallback, "theme": selected_theme, "layout_seed": layout_seed}
+
+
+# Attach images - patch the final UI with the images generated meanwhile
+async def attach_images_node(state: AgentState) -> Dict[str, Any]:
+    """Replace image handles in the final UI with the URLs of ready images.
+
+    Images are generated while the UI is designed and implemented; this waits
+    a short grace period for the ones still running, never past the request
+    deadline. Images that are not ready by then are left out.
+    """
+    handles = list(state["knowledge"]["generated_images"])
+    urls = {}
+    if handles:
+        timeout = min(IMAGE_WAIT_GRACE, time_left(state))
+        urls = await image_generator.wait(handles, timeout)
+        logging.info(f"Attached {len(urls)} of {len(handles)} generated images")
+
+    # Also moves any inline data: URL into the image store
+    return {"final_ui": image_store.resolve(state["final_ui"], urls)}
+
 
 # Create the graph-based workflow
-def create_graph_workflow():
+def create_graph_workflow(mode: str = "quality"):
+    """Compile the workflow for a pipeline mode.
+
+    "quality" writes a design plan, then implements it in a second call.
+    "fast" goes from research to components in one structured-output call.
+    """
     workflow = StateGraph(AgentState)
 
     # Add nodes
     workflow.add_node("research", research_agent_node)
     workflow.add_node("tools", custom_tool_node)
+
+    # Entry starts with research
+    workflow.set_entry_point("research")
+
+    # After research tool use, go back to research
+    workflow.add_edge("tools", "research")
+
+    if mode == "fast":
+        workflow.add_node("ui_fast", ui_fast_node)
+        workflow.add_node("attach_images", attach_images_node)
+        workflow.add_conditional_edges(
+            "research", tools_condition, {"tools": "tools", END: "ui_fast"}
+        )
+        workflow.add_edge("ui_fast", "attach_images")
+        workflow.add_edge("attach_images", END)
+        return workflow.compile()
+
     workflow.add_node("ui_designer", ui_designer_node)
     workflow.add_node("ui_tools", ui_tool_node)
     workflow.add_node("extract_design", extract_design_plan_node)
     workflow.add_node("ui_implementer", ui_implementer_node)
-
-    # Entry starts with research
-    workflow.set_entry_point("research")
+    workflow.add_node("attach_images", attach_images_node)
 
     # Add conditional edges from research
     workflow.add_conditional_edges(
@@ -580,9 +1127,6 @@ def create_graph_workflow():
         },
     )
 
-    # After research tool use, go back to research
-    workflow.add_edge("tools", "research")
-
     # Add conditional edges from UI designer
     workflow.add_conditional_edges(
         "ui_designer",
@@ -593,71 +1137,270 @@ def create_graph_workflow():
         },
     )
 
-    # After UI tool use, extract design plan
-    workflow.add_edge("ui_tools", "extract_design")
+    # After UI tool use, go back to the designer to write the plan
+    workflow.add_edge("ui_tools", "ui_designer")
 
     # After extracting design plan, implement UI
     workflow.add_edge("extract_design", "ui_implementer")
 
-    # End after UI implementation
-    workflow.add_edge("ui_implementer", END)
+    # Patch in the generated images, then end
+    workflow.add_edge("ui_implementer", "attach_images")
+    workflow.add_edge("attach_images", END)
 
     return workflow.compile()
 
 
-# Create the compiled workflow
-graph_workflow = create_graph_workflow()
+# Create the compiled workflows, built on first use
+graph_workflow = Lazy("graph_workflow", create_graph_workflow)
+fast_graph_workflow = Lazy("fast_graph_workflow", lambda: create_graph_workflow("fast"))
+
+# Workflow of each pipeline mode, requests pick one with "mode"
+PIPELINE_MODES = {"quality": graph_workflow, "fast": fast_graph_workflow}
+DEFAULT_PIPELINE_MODE = os.getenv("PIPELINE_MODE", "quality")
+
+# Nodes whose LLM output is the final components JSON
+FINAL_UI_NODES = ("ui_implementer", "ui_fast")
 
 # NOTE: this somehow is not local it uses the mermaid api to render the graph
 # graph_workflow.get_graph().draw_mermaid_png(output_file_path="graph_workflow.png")
 
 
-async def process_prompt(prompt: str, user_id: str = "anonymous") -> Dict[str, Any]:
+# Cache of generated UIs, keyed on prompt, user corpus version and settings.
+# The SQLite backend is shared by all server workers; set an empty
+# RESPONSE_CACHE_PATH to keep the cache in memory only.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    path=os.getenv("RESPONSE_CACHE_PATH", "./cache_data/responses.db") or None,
+)
+
+
+# Workflow runs in progress in this worker, keyed like the response cache, so
+# concurrent identical prompts share one run
+in_flight_runs = SingleFlight()
+single_flight_stats = {"runs": 0}
+
+
+def build_initial_state(
+    prompt: str, user_id: str, rag_k: Optional[int] = None
+) -> Dict[str, Any]:
+    """Initial graph state for a prompt."""
+    return {
+        "messages": [
+            HumanMessage(
+                content="You are a helpful research agent who will gather content related to the user's query using available tools. The information will be used by a UI generator to create beautiful interfaces. Gather comprehensive information and stop when you have enough for quality UI generation."
+            ),
+            HumanMessage(
+                content=f"User prompt: {truncate(prompt, MAX_USER_PROMPT_TOKENS)}"
+            ),
+        ],
+        "ui_messages": [],
+        "prompt": prompt,
+        "knowledge": empty_knowledge(),
+        "design_plan": "",
+        "final_ui": {},
+        "user_id": user_id,
+        "rag_k": rag_k,
+        "theme": None,
+        "layout_seed": None,
+        "iteration_count": 0,
+        "deadline": time.monotonic() + BUDGET["deadline"],
+        "tokens_used": 0,
+        "tool_calls_used": 0,
+    }
+
+
+def make_cache_key(
+    prompt: str, user_id: str, rag_k: Optional[int], mode: str = "quality"
+) -> str:
+    return response_cache.make_key(
+        prompt,
+        user_id,
+        rag_manager.corpus_versions.get(user_id),
+        {**MODEL_CONFIG, "rag_k": rag_k, "mode": mode},
+    )
+
+
+def cache_result(cache_key: str, result: Dict[str, Any]):
+    """Store a finished graph result, skipping fallback UIs.
+
+    The theme and seed are stored with the result so a cached UI can be
+    reproduced exactly.
+    """
+    if "error" not in result["final_ui"]:
+        response_cache.set(
+            cache_key,
+            {
+                "final_ui": result["final_ui"],
+                "theme": result.get("theme"),
+                "layout_seed": result.get("layout_seed"),
+            },
+        )
+
+
+def error_ui(e: Exception) -> Dict[str, Any]:
+    return {
+        "components": [
+            {
+                "type": "card",
+                "props": {
+                    "title": "Error",
+                    "content": f"An error occurred while processing your request: {str(e)}",
+                    "badge": "Error",
+                },
+            }
+        ],
+        "error": str(e),
+    }
+
+
+async def process_prompt(
+    prompt: str,
+    user_id: str = "anonymous",
+    rag_k: Optional[int] = None,
+    use_cache: bool = True,
+    mode: Optional[str] = None,
+) -> Dict[str, Any]:
     """Main function to process a prompt using the graph-based workflow"""
     logging.info(f"Processing prompt with enhanced graph workflow: {prompt}")
 
+    mode = mode or DEFAULT_PIPELINE_MODE
+    cache_key = make_cache_key(prompt, user_id, rag_k, mode)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            logging.info("Returning cached UI for prompt")
+            return cached["final_ui"]
+
+        if in_flight_runs.get(cache_key) is not None:
+            logging.info("Joining in-flight run for identical prompt")
+        return await in_flight_runs.run(
+            cache_key, lambda: run_workflow(cache_key, prompt, user_id, rag_k, mode)
+        )
+
+    # Not shared, but still not cancelled by a client disconnecting
+    return await asyncio.shield(
+        asyncio.ensure_future(run_workflow(cache_key, prompt, user_id, rag_k, mode))
+    )
+
+
+async def run_workflow(
+    cache_key: str,
+    prompt: str,
+    user_id: str,
+    rag_k: Optional[int],
+    mode: str = "quality",
+) -> Dict[str, Any]:
+    """Run the graph for a prompt and cache the resulting UI."""
+    single_flight_stats["runs"] += 1
     try:
-        # Initialize the state
-        initial_state = {
-            "messages": [
-                HumanMessage(
-                    content="You are a helpful research agent who will gather content related to the user's query using available tools. The information will be used by a UI generator to create beautiful interfaces. Gather comprehensive information and stop when you have enough for quality UI generation."
-                ),
-                HumanMessage(content=f"User prompt: {prompt}"),
-            ],
-            "ui_messages": [],
-            "prompt": prompt,
-            "knowledge": {
-                "docs": [],
-                "search": [],
-                "images": [],
-                "ui_images": [],
-                "generated_images": {},
-            },
-            "design_plan": "",
-            "final_ui": {},
-            "user_id": user_id,
-            "iteration_count": 0,
-        }
+        initial_state = build_initial_state(prompt, user_id, rag_k)
 
-        # Run the workflow with recursion limit
-        result = await graph_workflow.ainvoke(initial_state, {"recursion_limit": 10})
+        result = await PIPELINE_MODES[mode].ainvoke(
+            initial_state, {"recursion_limit": RECURSION_LIMIT}
+        )
+
+        logging.info(
+            f"Enhanced graph workflow completed successfully: "
+            f"{result['iteration_count']} research rounds, "
+            f"{result['tool_calls_used']} tool calls, {result['tokens_used']} tokens"
+        )
+        cache_result(cache_key, result)
 
-        logging.info("Enhanced graph workflow completed successfully")
         return result["final_ui"]
 
     except Exception as e:
         logging.exception("Error in enhanced graph workflow:")
-        return {
-            "components": [
-                {
-                    "type": "card",
-                    "props": {
-                        "title": "Error",
-                        "content": f"An error occurred while processing your request: {str(e)}",
-                        "badge": "Error",
-                    },
+        return error_ui(e)
+
+
+async def stream_prompt(
+    prompt: str,
+    user_id: str = "anonymous",
+    rag_k: Optional[int] = None,
+    use_cache: bool = True,
+    mode: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run the workflow and yield progress events as they happen.
+
+    Each event is a dict with an "event" name and a "data" payload. UI
+    components are emitted one by one while the implementer's tokens stream
+    in; a final "complete" event carries the full UI.
+    """
+    logging.info(f"Streaming prompt with enhanced graph workflow: {prompt}")
+
+    mode = mode or DEFAULT_PIPELINE_MODE
+    cache_key = make_cache_key(prompt, user_id, rag_k, mode)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            for component in cached["final_ui"].get("components", []):
+                yield {"event": "component", "data": component}
+            yield {"event": "complete", "data": cached["final_ui"]}
+            return
+
+    parser = ComponentStreamParser()
+    state = build_initial_state(prompt, user_id, rag_k)
+
+    try:
+        async for event in PIPELINE_MODES[mode].astream_events(
+            state, {"recursion_limit": RECURSION_LIMIT}, version="v2"
+        ):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chat_model_stream" and node in FINAL_UI_NODES:
+                if REPAIR_TAG in event.get("tags", []):
+                    # Repaired components are emitted with the final state
+                    continue
+                chunk = event["data"]["chunk"].content
+                if isinstance(chunk, str):
+                    for component in parser.feed(chunk):
+                        yield {"event": "component", "data": component}
+                continue
+
+            # Only look at the graph nodes themselves below
+            if event["name"] != node:
+                continue
+
+            if kind == "on_chain_start" and node == "research":
+                yield {"event": "research_started", "data": {}}
+            elif kind == "on_chain_end" and node == "tools":
+                knowledge = event["data"]["output"].get("knowledge", {})
+                yield {
+                    "event": "tool_results",
+                    "data": {key: len(value) for key, value in knowledge.items()},
                 }
-            ],
-            "error": str(e),
-        }
+            elif kind == "on_chain_start" and node in ("ui_designer", "ui_fast"):
+                yield {"event": "design_started", "data": {}}
+            elif kind == "on_chain_end" and node == "ui_designer":
+                # Only the designer's first pass picks the style
+                output = event["data"]["output"]
+                for key in ("theme", "layout_seed"):
+                    if key in output:
+                        state[key] = output[key]
+            elif kind == "on_chain_end" and node == "extract_design":
+                yield {
+                    "event": "design_plan_ready",
+                    "data": {"design_plan": event["data"]["output"]["design_plan"]},
+                }
+            elif kind == "on_chain_end" and node in FINAL_UI_NODES:
+                state.update(event["data"]["output"])
+            elif kind == "on_chain_end" and node == "attach_images":
+                # Streamed components may hold image handles, the final UI
+                # in the complete event has their URLs
+                state.update(event["data"]["output"])
+
+        final_ui = state["final_ui"]
+        if not final_ui.get("error"):
+            # Components that were not streamed: all of them if the model did
+            # not stream, or the ones added by a repair
+            for component in final_ui.get("components", [])[len(parser.components) :]:
+                yield {"event": "component", "data": component}
+
+        cache_result(cache_key, state)
+        yield {"event": "complete", "data": final_ui}
+
+    except Exception as e:
+        logging.exception("Error in streamed graph workflow:")
+        yield {"event": "error", "data": error_ui(e)}
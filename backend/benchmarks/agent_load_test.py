@@ -0,0 +1,158 @@
+"""Load test for process_prompt with stubbed LLM and tool backends.
+
+Fires N concurrent process_prompt calls and reports throughput. Run once with
+--blocking to emulate the previous behaviour (LLM and tool calls blocking the
+event loop) and once without it to measure the async graph.
+
+Usage: python benchmarks/agent_load_test.py [--requests 20] [--blocking]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.messages import AIMessage, ToolMessage  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+from langchain_core.tools import StructuredTool  # noqa: E402
+
+import agent  # noqa: E402
+import lazy  # noqa: E402
+
+STUB_COMPONENTS = {
+    "components": [
+        {"type": "card", "props": {"title": "Stub", "content": "Stub content"}}
+    ]
+}
+
+
+def make_wait(latency: float, blocking: bool):
+    async def wait():
+        if blocking:
+            time.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+
+    return wait
+
+
+def stub_llm(respond, wait):
+    async def ainvoke(messages):
+        await wait()
+        return respond(messages)
+
+    return RunnableLambda(lambda messages: respond(messages), afunc=ainvoke)
+
+
+def research_response(messages):
+    # First turn asks for every research tool, the next one stops researching
+    if isinstance(messages[-1], ToolMessage):
+        return AIMessage(content="Research complete")
+    return AIMessage(
+        content="",
+        tool_calls=[
+            {"name": "web_search_tool_fn", "args": {"query": "q"}, "id": "1"},
+            {"name": "image_search_tool_fn", "args": {"query": "q"}, "id": "2"},
+            {"name": "rag_search_tool_fn", "args": {"query": "q"}, "id": "3"},
+        ],
+    )
+
+
+def stub_tool(name: str, wait):
+    async def run(query: str, user_id: str = "anonymous"):
+        await wait()
+        if name == "rag_search_tool_fn":
+            return [Document(page_content="stub", metadata={"filename": "stub.pdf"})]
+        return [{"title": name, "snippet": "stub", "image": ""}]
+
+    return StructuredTool.from_function(coroutine=run, name=name, description=name)
+
+
+def install_stubs(llm_latency: float, tool_latency: float, blocking: bool):
+    llm_wait = make_wait(llm_latency, blocking)
+    tool_wait = make_wait(tool_latency, blocking)
+
+    stubs = {
+        "research_llm_with_tools": stub_llm(research_response, llm_wait),
+        "ui_llm_with_tools": stub_llm(
+            lambda messages: AIMessage(content="Stub design plan"), llm_wait
+        ),
+        "ui_llm_plan": stub_llm(
+            lambda messages: AIMessage(content="Stub design plan"), llm_wait
+        ),
+        "ui_llm": stub_llm(
+            lambda messages: AIMessage(content=json.dumps(STUB_COMPONENTS)), llm_wait
+        ),
+        "fast_ui_llm": stub_llm(
+            lambda messages: {
+                "raw": AIMessage(content=json.dumps(STUB_COMPONENTS)),
+                "parsed": STUB_COMPONENTS,
+            },
+            llm_wait,
+        ),
+    }
+    for name in [
+        "web_search_tool_fn",
+        "image_search_tool_fn",
+        "rag_search_tool_fn",
+        "ui_image_search_tool_fn",
+    ]:
+        stubs[name] = stub_tool(name, tool_wait)
+
+    for name, stub in stubs.items():
+        setattr(agent, name, stub)
+    # Warm-up would build the replaced clients on top of the stubs
+    lazy.registry[:] = [item for item in lazy.registry if item._name not in stubs]
+
+
+async def run_load(requests: int) -> float:
+    # Build the remaining clients first, like the server does at startup
+    await lazy.warm_up()
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            # Every run is measured, not replayed from the persistent response cache
+            agent.process_prompt(f"prompt {i}", f"user-{i}", use_cache=False)
+            for i in range(requests)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for result in results if "error" in result)
+    if errors:
+        print(f"{errors} requests failed")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-latency", type=float, default=0.1)
+    parser.add_argument(
+        "--blocking",
+        action="store_true",
+        help="Block the event loop in stubs, like the previous sync nodes did",
+    )
+    args = parser.parse_args()
+
+    install_stubs(args.llm_latency, args.tool_latency, args.blocking)
+    elapsed = asyncio.run(run_load(args.requests))
+
+    mode = "blocking" if args.blocking else "async"
+    print(
+        f"{mode}: {args.requests} requests in {elapsed:.2f}s "
+        f"({args.requests / elapsed:.2f} req/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
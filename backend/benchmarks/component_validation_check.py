@@ -0,0 +1,66 @@
+"""Check that component validation keeps everything the frontend can render.
+
+Models write numbers where the specs say string (stat values, years) and null
+for images they have none of; the frontend renders both. Such components must
+be kept with their props as text, while components missing required props
+are still rejected. Exits non-zero on any mismatch.
+
+Usage: python benchmarks/component_validation_check.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from component_schema import validate_component  # noqa: E402
+
+# (component, expected props or None when it must be rejected)
+CASES = [
+    (
+        {"type": "stats", "props": {"data": [{"value": 95, "label": "Score"}]}},
+        {"title": "", "data": [{"value": "95", "label": "Score", "icon": ""}]},
+    ),
+    (
+        {"type": "stats", "props": {"data": [{"value": 2.5, "label": 1999}]}},
+        {"title": "", "data": [{"value": "2.5", "label": "1999", "icon": ""}]},
+    ),
+    (
+        {"type": "hero", "props": {"title": "Intro", "image": None}},
+        {
+            "title": "Intro",
+            "subtitle": "",
+            "image": "",
+            "buttonText": "",
+            "buttonLink": "",
+        },
+    ),
+    (
+        {"type": "card", "props": {"title": "Card", "content": "Text", "image": None}},
+        {"title": "Card", "content": "Text", "image": "", "badge": ""},
+    ),
+    (
+        {"type": "testimonial", "props": {"quote": "Q", "author": "A", "avatar": None}},
+        {"quote": "Q", "author": "A", "role": "", "avatar": ""},
+    ),
+    ({"type": "card", "props": {"title": "No content"}}, None),
+    ({"type": "gallery", "props": {"images": None}}, None),
+    ({"type": "stats", "props": {"data": [{"value": 1}]}}, None),
+]
+
+
+def main():
+    failures = 0
+    for component, expected in CASES:
+        result = validate_component(component)
+        props = result["props"] if result else None
+        if props != expected:
+            failures += 1
+            print(f"FAIL {component}: got {props}, expected {expected}")
+
+    print(f"{len(CASES) - failures}/{len(CASES)} cases passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Check that UI generation gives up at the request deadline.
+
+Every UI LLM is replaced by a stub that takes far longer than the deadline.
+Both pipeline modes must still answer shortly after the deadline, with the
+fallback UI, instead of waiting for the LLM. Exits non-zero on any failure.
+
+Usage: python benchmarks/deadline_check.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+data_dir = tempfile.mkdtemp()
+os.environ["CORPUS_VERSIONS_PATH"] = os.path.join(data_dir, "corpus_versions.db")
+os.environ["RESPONSE_CACHE_PATH"] = ""
+os.environ["AGENT_DEADLINE"] = "2"
+os.environ["AGENT_UI_TIME_RESERVE"] = "1.5"
+
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+
+import agent  # noqa: E402
+import lazy  # noqa: E402
+
+DEADLINE = float(os.environ["AGENT_DEADLINE"])
+LLM_DELAY = 30  # seconds each UI LLM call would take
+SLACK = 1.0  # seconds allowed past the deadline
+
+
+async def research(messages):
+    # No tool calls, research hands over to UI generation right away
+    return AIMessage(content="Nothing to look up")
+
+
+async def slow(messages):
+    await asyncio.sleep(LLM_DELAY)
+    return AIMessage(content='{"components": []}')
+
+
+def stub_llm(respond):
+    return RunnableLambda(lambda messages: None, afunc=respond)
+
+
+def install_stubs():
+    stubs = {"research_llm_with_tools": stub_llm(research)}
+    for name in ("ui_llm", "ui_llm_with_tools", "ui_llm_plan", "fast_ui_llm"):
+        stubs[name] = stub_llm(slow)
+    for name, stub in stubs.items():
+        setattr(agent, name, stub)
+    lazy.registry[:] = [item for item in lazy.registry if item._name not in stubs]
+
+
+async def run_mode(mode: str) -> bool:
+    start = time.monotonic()
+    ui = await agent.process_prompt(
+        "Explain photosynthesis", "deadline-check", use_cache=False, mode=mode
+    )
+    elapsed = time.monotonic() - start
+    fallback = ui.get("error") == agent.DEADLINE_ERROR
+    print(f"{mode}: {elapsed:.2f}s (deadline {DEADLINE:.0f}s), fallback UI: {fallback}")
+    return elapsed < DEADLINE + SLACK and fallback
+
+
+async def run() -> bool:
+    install_stubs()
+    # Startup work is not part of a request's deadline
+    await lazy.warm_up()
+    results = [await run_mode(mode) for mode in ("quality", "fast")]
+    return all(results)
+
+
+def main():
+    sys.exit(0 if asyncio.run(run()) else 1)
+
+
+if __name__ == "__main__":
+    main()
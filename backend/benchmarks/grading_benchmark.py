@@ -0,0 +1,113 @@
+"""Benchmark relevance grading latency with a stub LLM.
+
+Compares the old one-by-one grading loop against the grading modes in
+grading.py for k=3..20 retrieved chunks and reports p50/p95 retrieval time.
+
+Usage: python benchmarks/grading_benchmark.py [--latency 0.3] [--runs 20]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+
+from grading import GRADING_MODES, RelevanceGrader  # noqa: E402
+
+K_VALUES = [3, 5, 10, 15, 20]
+
+
+def make_stub_llm(latency: float) -> RunnableLambda:
+    """Stub chat model that sleeps for `latency` seconds per call."""
+
+    def respond(prompt_value) -> AIMessage:
+        text = prompt_value.to_string()
+        count = len(re.findall(r"^\s*Document \d+:", text, re.MULTILINE))
+        if count:
+            scores = [random.choice(["yes", "no"]) for _ in range(count)]
+            return AIMessage(content=json.dumps({"scores": scores}))
+        return AIMessage(content=json.dumps({"score": random.choice(["yes", "no"])}))
+
+    def invoke(prompt_value):
+        time.sleep(latency)
+        return respond(prompt_value)
+
+    async def ainvoke(prompt_value):
+        await asyncio.sleep(latency)
+        return respond(prompt_value)
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+
+def make_scored_docs(k: int):
+    return [
+        (Document(page_content=f"Chunk {i} about topic {i % 4}"), random.random())
+        for i in range(k)
+    ]
+
+
+async def sequential_baseline(grader: RelevanceGrader, question, scored_docs):
+    """The previous implementation: one blocking grader call per chunk."""
+    relevant = []
+    for doc, _ in scored_docs:
+        grade = grader.single_grader.invoke(
+            {"question": question, "document": doc.page_content}
+        )
+        if grade.get("score") == "yes":
+            relevant.append(doc)
+    return relevant
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, round(q * (len(samples) - 1)))
+    return samples[index]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+
+    llm = make_stub_llm(args.latency)
+    graders = {
+        mode: RelevanceGrader(llm, mode=mode, max_concurrency=args.concurrency)
+        for mode in GRADING_MODES
+    }
+    question = "What is covered in the lecture?"
+
+    print(f"stub latency={args.latency}s runs={args.runs} cap={args.concurrency}")
+    print(f"{'k':>3} {'mode':>10} {'p50 (s)':>9} {'p95 (s)':>9}")
+
+    for k in K_VALUES:
+        strategies = {"sequential": None, **graders}
+        for name, grader in strategies.items():
+            samples = []
+            for _ in range(args.runs):
+                scored_docs = make_scored_docs(k)
+                start = time.perf_counter()
+                if grader is None:
+                    await sequential_baseline(graders["batch"], question, scored_docs)
+                else:
+                    await grader.agrade(question, scored_docs)
+                samples.append(time.perf_counter() - start)
+            print(
+                f"{k:>3} {name:>10} {statistics.median(samples):>9.3f} "
+                f"{percentile(samples, 0.95):>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,237 @@
+"""Benchmark retrieval quality and latency of vector, keyword and hybrid search.
+
+Builds a synthetic multi-user corpus of course notes. Every chunk mentions a
+unique course code and the vocabulary of its topic. Two query sets are run:
+
+- exact: "what is <course code>", answered by a single chunk. Embeddings see
+  codes as noise, so only keyword search can find it.
+- paraphrase: the topic described with synonyms that never occur in the
+  corpus, answered by any chunk of the topic. Only embeddings can match these.
+
+Embeddings are synthetic (sum of concept centroids), so no API calls are made.
+Reports hit rate and MRR at k, p50/p95 latency and query embeddings per query.
+
+Usage: python benchmarks/hybrid_retrieval_benchmark.py [--users 20] [--chunks 200]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+DIMENSIONS = 64
+
+# Surface forms of each concept; the last one never appears in the corpus
+CONCEPTS = {
+    "heat": ["heat", "thermal", "warmth"],
+    "disorder": ["entropy", "disorder", "randomness"],
+    "motion": ["motion", "kinematics", "movement"],
+    "force": ["force", "newton", "push"],
+    "cell": ["cell", "cytology", "cellular"],
+    "gene": ["gene", "dna", "heredity"],
+    "market": ["market", "trade", "commerce"],
+    "price": ["price", "cost", "valuation"],
+    "poem": ["poem", "verse", "poetry"],
+    "war": ["war", "battle", "conflict"],
+    "circuit": ["circuit", "voltage", "electricity"],
+    "proof": ["proof", "theorem", "demonstration"],
+}
+TOPICS = [
+    ("heat", "disorder"),
+    ("motion", "force"),
+    ("cell", "gene"),
+    ("market", "price"),
+    ("poem", "war"),
+    ("circuit", "proof"),
+]
+FILLER = (
+    "lecture week notes chapter example exercise summary students reading "
+    "assignment review slides session introduction overview"
+).split()
+SURFACE_TO_CONCEPT = {
+    word: concept for concept, words in CONCEPTS.items() for word in words
+}
+
+
+class SyntheticEmbeddings(Embeddings):
+    """Sums concept centroids; unknown words (codes, filler) only add noise."""
+
+    def __init__(self, noise: float = 0.35):
+        rng = random.Random(0)
+        self.noise = noise
+        self.centroids = {
+            concept: [rng.gauss(0, 1) for _ in range(DIMENSIONS)]
+            for concept in CONCEPTS
+        }
+        self.query_calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * DIMENSIONS
+        for word in text.lower().replace("?", " ").split():
+            concept = SURFACE_TO_CONCEPT.get(word)
+            if concept:
+                centroid = self.centroids[concept]
+            else:
+                seed = int(hashlib.md5(word.encode()).hexdigest()[:8], 16)
+                rng = random.Random(seed)
+                centroid = [rng.gauss(0, self.noise) for _ in range(DIMENSIONS)]
+            vector = [v + c for v, c in zip(vector, centroid)]
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.query_calls += 1
+        return self._embed(text)
+
+
+def build_corpus(users: int, chunks: int, seed: int = 0) -> List[Document]:
+    rng = random.Random(seed)
+    documents = []
+    for user in range(users):
+        for chunk in range(chunks):
+            topic = TOPICS[chunk % len(TOPICS)]
+            code = f"{topic[0][:3].upper()}{user:03d}{chunk:03d}"
+            words = [code]
+            for concept in topic:
+                words += rng.choices(CONCEPTS[concept][:-1], k=3)
+            words += rng.choices(FILLER, k=12)
+            rng.shuffle(words)
+            documents.append(
+                Document(
+                    page_content=" ".join(words),
+                    metadata={
+                        "user_id": f"user-{user}",
+                        "filename": f"course-{chunk % 10}.pdf",
+                        "code": code,
+                        "topic": "+".join(topic),
+                    },
+                )
+            )
+    return documents
+
+
+def build_queries(documents: List[Document], count: int, seed: int = 1):
+    rng = random.Random(seed)
+    exact, paraphrase = [], []
+    for doc in rng.sample(documents, count):
+        user_id = doc.metadata["user_id"]
+        exact.append(
+            (f"what is {doc.metadata['code']}", user_id, "code", doc.metadata["code"])
+        )
+        topic = doc.metadata["topic"].split("+")
+        query = "explain " + " ".join(CONCEPTS[concept][-1] for concept in topic)
+        paraphrase.append((query, user_id, "topic", doc.metadata["topic"]))
+    return {"exact": exact, "paraphrase": paraphrase}
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, round(q * (len(samples) - 1)))]
+
+
+def evaluate(search, queries, k, embeddings):
+    hits, reciprocal_ranks, latencies = 0, 0.0, []
+    embeddings.query_calls = 0
+    for query, user_id, field, expected in queries:
+        start = time.perf_counter()
+        results = search(query, user_id, k)
+        latencies.append(time.perf_counter() - start)
+
+        for rank, (doc, _) in enumerate(results):
+            if doc.metadata.get(field) == expected:
+                hits += 1
+                reciprocal_ranks += 1 / (rank + 1)
+                break
+    n = len(queries)
+    return hits / n, reciprocal_ranks / n, latencies, embeddings.query_calls / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Keep every store of the RAG manager inside the temporary directory
+        os.environ["VECTORSTORE_DIR"] = os.path.join(data_dir, "vectorstore")
+        for name, filename in [
+            ("EMBEDDING_CACHE_PATH", "embeddings.db"),
+            ("DOCUMENT_INDEX_PATH", "document_index.db"),
+            ("LEXICAL_INDEX_PATH", "lexical_index.db"),
+            ("CORPUS_VERSIONS_PATH", "corpus_versions.db"),
+            ("VECTORSTORE_STAMP_PATH", "vectorstore.stamp"),
+        ]:
+            os.environ[name] = os.path.join(data_dir, filename)
+
+        from rag_manager import rag_manager as lazy_rag_manager
+
+        # The real instance, so search settings can be switched per strategy
+        rag_manager = lazy_rag_manager.get_instance()
+        embeddings = SyntheticEmbeddings()
+        rag_manager.embeddings.embeddings = embeddings
+        # Measure the searches themselves, not the query embedding cache
+        rag_manager.embeddings.query_cache_size = 0
+
+        documents = build_corpus(args.users, args.chunks)
+        start = time.perf_counter()
+        for i in range(0, len(documents), 5000):
+            rag_manager.add_documents_to_vectorstore(documents[i : i + 5000])
+        print(f"indexed {len(documents)} chunks in {time.perf_counter() - start:.1f}s")
+
+        def hybrid(fast_path: bool):
+            def search(query, user_id, k):
+                rag_manager.hybrid_search = True
+                rag_manager.lexical_fast_path = fast_path
+                return rag_manager.search_documents(query, user_id, k)
+
+            return search
+
+        def vector_only(query, user_id, k):
+            rag_manager.hybrid_search = False
+            return rag_manager.search_documents(query, user_id, k)
+
+        strategies = [
+            ("vector only", vector_only),
+            ("keyword only", rag_manager.lexical_index.search),
+            ("hybrid (RRF)", hybrid(False)),
+            ("hybrid + fast path", hybrid(True)),
+        ]
+
+        query_sets = build_queries(documents, args.queries)
+        for set_name, queries in query_sets.items():
+            print(f"\n{set_name} queries, k={args.k}")
+            print(
+                f"{'strategy':>20} {'hit@k':>6} {'MRR':>6} "
+                f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'embeds/query':>13}"
+            )
+            for name, search in strategies:
+                hit_rate, mrr, latencies, embeds = evaluate(
+                    search, queries, args.k, embeddings
+                )
+                print(
+                    f"{name:>20} {hit_rate:>6.3f} {mrr:>6.3f} "
+                    f"{statistics.median(latencies) * 1000:>9.2f} "
+                    f"{percentile(latencies, 0.95) * 1000:>9.2f} {embeds:>13.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Compare the quality (design plan + implementation) and fast pipeline modes.
+
+LLM and tool backends are stubbed. Each stub LLM call takes a base latency
+plus time proportional to its prompt and output sizes (tokens estimated as
+characters / 4), and reports those token counts as usage metadata, so the
+cost of the second, plan-embedding call of the quality mode shows up in both
+latency and tokens.
+
+Usage: python benchmarks/pipeline_mode_benchmark.py [--requests 20] [--plan-chars 6000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+os.environ["RESPONSE_CACHE_PATH"] = ""
+
+from langchain_core.messages import AIMessage, ToolMessage  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+from langchain_core.tools import StructuredTool  # noqa: E402
+
+import agent  # noqa: E402
+
+STUB_COMPONENTS = {
+    "components": [
+        {
+            "type": "hero",
+            "props": {"title": "Stub", "subtitle": "Stub", "image": ""},
+        },
+        {"type": "card", "props": {"title": "Stub", "content": "Stub content"}},
+        {"type": "list", "props": {"title": "Stub", "items": [{"text": "a"}]}},
+    ]
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class LatencyModel:
+    def __init__(self, base: float, input_rate: float, output_rate: float):
+        self.base = base
+        self.input_rate = input_rate  # seconds per 1000 prompt tokens
+        self.output_rate = output_rate  # generated tokens per second
+        self.calls = 0
+
+    async def respond(self, messages, content: str, **kwargs) -> AIMessage:
+        prompt = "".join(str(message.content) for message in messages)
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        self.calls += 1
+        await asyncio.sleep(
+            self.base
+            + input_tokens / 1000 * self.input_rate
+            + output_tokens / self.output_rate
+        )
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            **kwargs,
+        )
+
+
+def stub_llm(respond):
+    return RunnableLambda(lambda messages: None, afunc=respond)
+
+
+def install_stubs(model: LatencyModel, plan_chars: int):
+    async def research(messages):
+        # One round of tool calls, then hand over to UI generation
+        if isinstance(messages[-1], ToolMessage):
+            return await model.respond(messages, "Research complete")
+        return await model.respond(
+            messages,
+            "",
+            tool_calls=[
+                {"name": "web_search_tool_fn", "args": {"query": "q"}, "id": "1"},
+                {"name": "image_search_tool_fn", "args": {"query": "q"}, "id": "2"},
+            ],
+        )
+
+    plan = ("Design plan: hero first, then cards and a list. " * 200)[:plan_chars]
+    components = json.dumps(STUB_COMPONENTS)
+
+    async def designer(messages):
+        return await model.respond(messages, plan)
+
+    async def implementer(messages):
+        return await model.respond(messages, components)
+
+    async def fast(messages):
+        raw = await model.respond(messages, components)
+        return {"raw": raw, "parsed": json.loads(components), "parsing_error": None}
+
+    agent.research_llm_with_tools = stub_llm(research)
+    agent.ui_llm_with_tools = stub_llm(designer)
+    agent.ui_llm_plan = stub_llm(designer)
+    agent.ui_llm = stub_llm(implementer)
+    agent.fast_ui_llm = stub_llm(fast)
+
+    async def search(query: str):
+        await asyncio.sleep(0.05)
+        return [
+            {"title": f"Result {i}", "snippet": "stub " * 30, "link": f"{query}{i}"}
+            for i in range(5)
+        ]
+
+    for name in ["web_search_tool_fn", "image_search_tool_fn"]:
+        setattr(
+            agent,
+            name,
+            StructuredTool.from_function(coroutine=search, name=name, description=name),
+        )
+
+
+async def run_mode(mode: str, requests: int, model: LatencyModel):
+    workflow = agent.PIPELINE_MODES[mode]
+    latencies, tokens = [], []
+    model.calls = 0
+    for i in range(requests):
+        state = agent.build_initial_state(f"prompt {i}", "anonymous")
+        start = time.perf_counter()
+        result = await workflow.ainvoke(
+            state, {"recursion_limit": agent.RECURSION_LIMIT}
+        )
+        latencies.append(time.perf_counter() - start)
+        tokens.append(result["tokens_used"])
+        if "error" in result["final_ui"]:
+            print(f"{mode}: request {i} fell back: {result['final_ui']['error']}")
+    return latencies, tokens, model.calls / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--plan-chars", type=int, default=6000)
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--input-rate", type=float, default=0.05)
+    parser.add_argument("--output-rate", type=float, default=500)
+    args = parser.parse_args()
+
+    model = LatencyModel(args.base_latency, args.input_rate, args.output_rate)
+    install_stubs(model, args.plan_chars)
+
+    print(
+        f"{'mode':>8} {'p50 (s)':>8} {'p95 (s)':>8} "
+        f"{'tokens/request':>15} {'LLM calls/request':>18}"
+    )
+    for mode in agent.PIPELINE_MODES:
+        latencies, tokens, calls = asyncio.run(run_mode(mode, args.requests, model))
+        p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+        print(
+            f"{mode:>8} {statistics.median(latencies):>8.2f} {p95:>8.2f} "
+            f"{statistics.mean(tokens):>15.0f} {calls:>18.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Check that the API rejects out-of-range retrieval depths with a 422.
+
+k sets how many chunks are retrieved, graded and put in the prompt per RAG
+query, so values outside 1..MAX_RAG_K must not reach the pipeline. The agent
+is replaced by a stub, so accepted requests only show that validation let
+them through. Exits non-zero on any failure.
+
+Usage: python benchmarks/request_validation_check.py
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+data_dir = tempfile.mkdtemp()
+os.environ["CORPUS_VERSIONS_PATH"] = os.path.join(data_dir, "corpus_versions.db")
+os.environ["RESPONSE_CACHE_PATH"] = ""
+os.environ["WARMUP_ON_STARTUP"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main as api  # noqa: E402
+from rag_manager import MAX_RAG_K  # noqa: E402
+
+INVALID_K = [0, -1, MAX_RAG_K + 1, 10**9]
+VALID_K = [None, 1, MAX_RAG_K]
+
+
+async def stub_process_prompt(prompt, user_id, rag_k, use_cache, mode):
+    return {"components": [], "k": rag_k}
+
+
+def run() -> bool:
+    api.process_prompt = stub_process_prompt
+    client = TestClient(api.app)
+    ok = True
+
+    for k in INVALID_K:
+        statuses = [
+            client.post("/api/agent", json={"prompt": "p", "k": k}).status_code,
+            client.post("/api/agent/stream", json={"prompt": "p", "k": k}).status_code,
+            client.post(
+                "/api/test-rag", data={"query": "q", "user_id": "u", "k": k}
+            ).status_code,
+        ]
+        print(f"k={k}: agent, stream, test-rag -> {statuses} (expected 422)")
+        ok = ok and statuses == [422, 422, 422]
+
+    for k in VALID_K:
+        response = client.post("/api/agent", json={"prompt": "p", "k": k})
+        served = response.status_code == 200 and response.json()["k"] == k
+        print(f"k={k}: agent -> {response.status_code} (expected 200)")
+        ok = ok and served
+
+    return ok
+
+
+def main():
+    sys.exit(0 if run() else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Check that cached UIs are kept per user and the memory LRU stays bounded.
+
+Two users with the same corpus version counters must never share a cache
+key, or one would be served a UI built from the other's documents. Reading
+entries back from disk must not grow the in-memory LRU past max_entries.
+Exits non-zero on any failure.
+
+Usage: python benchmarks/response_cache_check.py
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+data_dir = tempfile.mkdtemp()
+os.environ["CORPUS_VERSIONS_PATH"] = os.path.join(data_dir, "corpus_versions.db")
+
+import agent  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+
+def check_keys_per_user() -> bool:
+    versions = agent.rag_manager.corpus_versions
+    versions.bump("alice")
+    versions.bump("bob")
+    same_counters = versions.get("alice") == versions.get("bob")
+
+    alice = agent.make_cache_key("Explain photosynthesis", "alice", None)
+    bob = agent.make_cache_key("Explain photosynthesis", "bob", None)
+    print(f"equal corpus versions: {same_counters}, distinct keys: {alice != bob}")
+    return same_counters and alice != bob
+
+
+def check_disk_hits_bounded() -> bool:
+    path = os.path.join(data_dir, "responses.db")
+    writer = ResponseCache(max_entries=10, path=path)
+    for i in range(10):
+        writer.set(f"key-{i}", {"final_ui": i})
+
+    reader = ResponseCache(max_entries=3, path=path)
+    hits = sum(reader.get(f"key-{i}") is not None for i in range(10))
+    entries = reader.stats()["entries"]
+    print(f"disk hits: {hits}, entries in memory: {entries} (max 3)")
+    return hits == 10 and entries <= 3
+
+
+def main():
+    ok = check_keys_per_user()
+    ok = check_disk_hits_bounded() and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Check that only non-empty search results are cached.
+
+An empty result or a failed search must reach upstream again on the next
+call instead of being served from the cache for the whole TTL; real results
+must be served from the cache. The search tool is a stub. Exits non-zero on
+any failure.
+
+Usage: python benchmarks/search_cache_check.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from response_cache import ResponseCache  # noqa: E402
+from search_cache import SearchCache, TokenBucket  # noqa: E402
+
+
+class StubSearchTool:
+    backend = "text"
+    max_results = 5
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def ainvoke(self, query):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+async def upstream_calls(outcomes, searches: int) -> int:
+    cache = SearchCache(ResponseCache(), TokenBucket(rate=1000, capacity=1000))
+    tool = StubSearchTool(outcomes)
+    for _ in range(searches):
+        try:
+            await cache.search(tool, "photosynthesis")
+        except ValueError:
+            pass
+    return tool.calls
+
+
+async def run() -> bool:
+    result = [{"title": "Photosynthesis", "link": "https://example.com"}]
+    cases = [
+        ("empty then results", [[], result], 2),
+        ("failure then results", [ValueError("upstream down"), result], 2),
+        ("results", [result], 1),
+    ]
+    ok = True
+    for name, outcomes, expected in cases:
+        calls = await upstream_calls(outcomes, searches=3)
+        print(f"{name}: {calls} upstream calls for 3 searches (expected {expected})")
+        ok = ok and calls == expected
+    return ok
+
+
+def main():
+    sys.exit(0 if asyncio.run(run()) else 1)
+
+
+if __name__ == "__main__":
+    main()
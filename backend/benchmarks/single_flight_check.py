@@ -0,0 +1,64 @@
+"""Check that concurrent identical prompts share a run only within one user.
+
+The workflow is replaced by a stub that records the user it runs for. The
+same prompt sent at once by one user must run once; sent at once by two
+users it must run once per user, each getting a UI built for them.
+Exits non-zero on any failure.
+
+Usage: python benchmarks/single_flight_check.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+data_dir = tempfile.mkdtemp()
+os.environ["CORPUS_VERSIONS_PATH"] = os.path.join(data_dir, "corpus_versions.db")
+os.environ["RESPONSE_CACHE_PATH"] = ""
+
+import agent  # noqa: E402
+
+runs = []
+
+
+async def stub_workflow(cache_key, prompt, user_id, rag_k, mode="quality"):
+    runs.append(user_id)
+    await asyncio.sleep(0.2)
+    return {"components": [], "built_for": user_id}
+
+
+async def run() -> bool:
+    agent.run_workflow = stub_workflow
+    prompt = "Explain photosynthesis"
+
+    same_user = await asyncio.gather(
+        *(agent.process_prompt(prompt, "alice") for _ in range(3))
+    )
+    same_user_runs = len(runs)
+    print(f"one user, 3 requests: {same_user_runs} run (expected 1)")
+
+    runs.clear()
+    two_users = await asyncio.gather(
+        agent.process_prompt(prompt, "carol"), agent.process_prompt(prompt, "dave")
+    )
+    served = [ui["built_for"] for ui in two_users]
+    print(f"two users: runs for {sorted(runs)}, served {served}")
+
+    return (
+        same_user_runs == 1
+        and all(ui["built_for"] == "alice" for ui in same_user)
+        and sorted(runs) == ["carol", "dave"]
+        and served == ["carol", "dave"]
+    )
+
+
+def main():
+    sys.exit(0 if asyncio.run(run()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Measure cold start: import time of main and time until warm.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+reports the total import time and the slowest top-level imports, then times
+lazy.warm_up() to show what is deferred until startup or first use.
+
+Usage: python benchmarks/startup_benchmark.py [--top 15]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+WARMUP_SCRIPT = """
+import asyncio, time
+start = time.perf_counter()
+import main, lazy
+imported = time.perf_counter() - start
+asyncio.run(lazy.warm_up())
+warm = time.perf_counter() - start
+print(f"{imported:.3f} {warm:.3f}")
+"""
+
+
+def run(args, env):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = {**os.environ, "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "stub")}
+
+    result = run(["-X", "importtime", "-c", "import main"], env)
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            _, cumulative, indent, module = match.groups()
+            imports.append((int(cumulative), len(indent), module))
+
+    total = next(us for us, _, module in imports if module == "main")
+    print(f"import main: {total / 1e6:.3f}s")
+    print("slowest imports (cumulative):")
+    # Imports made by main and by the modules it imports directly
+    top_level = [item for item in imports if item[1] <= 5 and item[2] != "main"]
+    for cumulative, _, module in sorted(top_level, reverse=True)[: args.top]:
+        print(f"  {cumulative / 1e6:>7.3f}s  {module}")
+
+    imported, warm = run(["-c", WARMUP_SCRIPT], env).stdout.split()[-2:]
+    print(f"imported after {imported}s, warm after {warm}s")
+
+
+if __name__ == "__main__":
+    main()
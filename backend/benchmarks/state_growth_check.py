@@ -0,0 +1,74 @@
+"""Check that agent state grows linearly over a 3-iteration research loop.
+
+Runs the graph against stubbed LLMs and tools whose research model always
+asks for more tools, so the loop runs until the iteration cap. Reports the
+final message count and serialized state size and exits non-zero when the
+message history contains more than the expected deltas.
+
+Usage: python benchmarks/state_growth_check.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+
+from langchain_core.messages import AIMessage  # noqa: E402
+
+import agent  # noqa: E402
+from agent_load_test import install_stubs  # noqa: E402
+
+RESEARCH_ITERATIONS = 3
+TOOLS_PER_TURN = 3
+
+
+def always_research(messages):
+    return AIMessage(
+        content="",
+        tool_calls=[
+            {"name": "web_search_tool_fn", "args": {"query": "q"}, "id": "1"},
+            {"name": "image_search_tool_fn", "args": {"query": "q"}, "id": "2"},
+            {"name": "rag_search_tool_fn", "args": {"query": "q"}, "id": "3"},
+        ],
+    )
+
+
+async def run() -> dict:
+    install_stubs(llm_latency=0, tool_latency=0, blocking=False)
+    agent.research_llm_with_tools = agent.RunnableLambda(always_research)
+
+    graph = agent.create_graph_workflow()
+    initial_state = agent.build_initial_state("prompt", "anonymous")
+    return await graph.ainvoke(
+        initial_state, {"recursion_limit": agent.RECURSION_LIMIT}
+    )
+
+
+def main():
+    state = asyncio.run(run())
+
+    # 2 initial messages, one AI message and its tool messages per research
+    # iteration, and the implementer's final message
+    expected = 2 + RESEARCH_ITERATIONS * (1 + TOOLS_PER_TURN) + 1
+    messages = len(state["messages"])
+    size = len(json.dumps(state, default=str))
+
+    print(f"messages: {messages} (expected {expected})")
+    print(f"ui_messages: {len(state['ui_messages'])} (expected 2)")
+    print(f"knowledge.search: {len(state['knowledge']['search'])} (expected 3)")
+    print(f"serialized state: {size} bytes")
+
+    ok = (
+        messages == expected
+        and len(state["ui_messages"]) == 2
+        and len(state["knowledge"]["search"]) == RESEARCH_ITERATIONS
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
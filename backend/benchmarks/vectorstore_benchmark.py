@@ -0,0 +1,139 @@
+"""Benchmark per-user retrieval on a multi-tenant Chroma collection.
+
+Every user uploads material on the same shared topics, so a global top-k is
+dominated by other tenants. Compares the previous approach (global top-k, then
+filter by user_id in Python) with pushing the user_id filter into the vector
+query, and measures how long reopening the persisted store takes.
+
+Embeddings are synthetic (topic centroid plus noise), so no API calls are made.
+
+Usage: python benchmarks/vectorstore_benchmark.py [--users 1000] [--chunks 100]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_community.vectorstores import Chroma  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+DIMENSIONS = 64
+TOPICS = 20
+COLLECTION = "educational_materials"
+
+
+class SyntheticEmbeddings(Embeddings):
+    """Embeds "topic:<n> <anything>" texts near the centroid of topic n."""
+
+    def __init__(self, noise: float = 0.3):
+        rng = random.Random(0)
+        self.noise = noise
+        self.centroids = [
+            [rng.gauss(0, 1) for _ in range(DIMENSIONS)] for _ in range(TOPICS)
+        ]
+
+    def _embed(self, text: str) -> List[float]:
+        topic = int(text.split()[0].split(":")[1])
+        rng = random.Random(text)
+        return [c + rng.gauss(0, self.noise) for c in self.centroids[topic]]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def populate(store: Chroma, users: int, chunks: int, batch_size: int = 5000):
+    texts, metadatas = [], []
+    for user in range(users):
+        for chunk in range(chunks):
+            texts.append(f"topic:{chunk % TOPICS} user {user} chunk {chunk}")
+            metadatas.append({"user_id": f"user-{user}", "filename": "notes.pdf"})
+    for start in range(0, len(texts), batch_size):
+        store.add_texts(
+            texts[start : start + batch_size],
+            metadatas=metadatas[start : start + batch_size],
+        )
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, round(q * (len(samples) - 1)))]
+
+
+def run_queries(store: Chroma, users: int, queries: int, k: int, pushdown: bool):
+    rng = random.Random(1)
+    latencies, hits = [], 0
+    for i in range(queries):
+        user_id = f"user-{rng.randrange(users)}"
+        query = f"topic:{rng.randrange(TOPICS)} query {i}"
+
+        start = time.perf_counter()
+        if pushdown:
+            docs = store.similarity_search(query, k=k, filter={"user_id": user_id})
+        else:
+            docs = store.similarity_search(query, k=k)
+            docs = [doc for doc in docs if doc.metadata.get("user_id") == user_id]
+        latencies.append(time.perf_counter() - start)
+
+        # Each user has chunks on every topic, so k of them should come back
+        hits += len(docs)
+    return hits / (queries * k), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--chunks", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    embeddings = SyntheticEmbeddings()
+    with tempfile.TemporaryDirectory() as persist_directory:
+        store = Chroma(
+            collection_name=COLLECTION,
+            embedding_function=embeddings,
+            persist_directory=persist_directory,
+        )
+        start = time.perf_counter()
+        populate(store, args.users, args.chunks)
+        print(
+            f"indexed {args.users * args.chunks} chunks in "
+            f"{time.perf_counter() - start:.1f}s"
+        )
+
+        start = time.perf_counter()
+        store = Chroma(
+            collection_name=COLLECTION,
+            embedding_function=embeddings,
+            persist_directory=persist_directory,
+        )
+        count = store._collection.count()
+        print(
+            f"reopened persisted store ({count} chunks) in "
+            f"{time.perf_counter() - start:.3f}s"
+        )
+
+        print(f"{'strategy':>18} {'recall@k':>9} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+        for name, pushdown in [("global top-k", False), ("user_id filter", True)]:
+            recall, latencies = run_queries(
+                store, args.users, args.queries, args.k, pushdown
+            )
+            print(
+                f"{name:>18} {recall:>9.3f} "
+                f"{statistics.median(latencies) * 1000:>9.2f} "
+                f"{percentile(latencies, 0.95) * 1000:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
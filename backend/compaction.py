@@ -0,0 +1,55 @@
+"""Background compaction of the SQLite stores after deletions."""
+
+import logging
+import sqlite3
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def vacuum_if_fragmented(conn: sqlite3.Connection, min_free_ratio: float = 0.2) -> bool:
+    """VACUUM a database once enough of its pages are free after deletes.
+
+    Returns whether the database was vacuumed.
+    """
+    (page_count,) = conn.execute("PRAGMA page_count").fetchone()
+    (free_pages,) = conn.execute("PRAGMA freelist_count").fetchone()
+    if not page_count or free_pages / page_count < min_free_ratio:
+        return False
+
+    conn.execute("VACUUM")
+    # Fold the WAL back into the main file so the space is returned to the OS
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    logger.info(f"Vacuumed database, reclaimed {free_pages} of {page_count} pages")
+    return True
+
+
+class CompactionScheduler:
+    """Runs a compaction callback in a background thread, debounced.
+
+    A burst of deletions schedules a single run, `delay` seconds after the
+    first one.
+    """
+
+    def __init__(self, compact: Callable[[], None], delay: float = 30.0):
+        self.compact = compact
+        self.delay = delay
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.delay, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Compaction failed: {str(e)}")
@@ -0,0 +1,104 @@
+"""Incremental parsing of the UI implementer's JSON output."""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from component_schema import validate_component
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS_ARRAY = re.compile(r'"components"\s*:\s*\[')
+
+
+class ComponentStreamParser:
+    """Extracts complete objects from the "components" array of streamed JSON.
+
+    Text can be fed in arbitrary pieces (e.g. LLM tokens); every component
+    object is returned as soon as its closing brace arrives, without waiting
+    for the rest of the document. Components that are malformed or fail
+    validation are skipped and counted, the others are kept, so one broken
+    component does not cost the whole output.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.components: List[Dict[str, Any]] = []
+        self.rejected: List[str] = []  # raw text of the components skipped
+        self.done = False  # the components array has been closed
+        self._parsed_end = 0  # end of the last component that was parsed
+
+        self._pos: Optional[int] = None  # next character to scan
+        self._depth = 0  # nesting depth inside the components array
+        self._in_string = False
+        self._escape = False
+        self._item_start: Optional[int] = None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Add text and return the components completed by it."""
+        self.buffer += text
+
+        if self._pos is None:
+            match = COMPONENTS_ARRAY.search(self.buffer)
+            if not match:
+                return []
+            self._pos = self._parsed_end = match.end()
+
+        new_components = []
+        buffer = self.buffer
+        while self._pos < len(buffer) and not self.done:
+            ch = buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._item_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the components array itself
+                    self.done = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0 and self._item_start is not None:
+                        raw = buffer[self._item_start : self._pos + 1]
+                        component = self._parse_item(raw)
+                        if component is not None:
+                            new_components.append(component)
+                        else:
+                            self.rejected.append(raw)
+                        self._item_start = None
+                        self._parsed_end = self._pos + 1
+            self._pos += 1
+
+        self.components.extend(new_components)
+        return new_components
+
+    @property
+    def complete(self) -> bool:
+        """Whether the array was closed and every component in it was valid."""
+        return self.done and not self.rejected
+
+    @property
+    def tail(self) -> str:
+        """Text after the last component parsed, where the output broke off."""
+        if self._pos is None:
+            return self.buffer
+        return self.buffer[self._parsed_end :]
+
+    @staticmethod
+    def _parse_item(raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            component = json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed component: {e}")
+            return None
+        return validate_component(component)
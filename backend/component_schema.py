@@ -0,0 +1,194 @@
+"""UI component specifications, validation models and response schema."""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    ValidationError,
+    ValidationInfo,
+    field_validator,
+)
+
+logger = logging.getLogger(__name__)
+
+# Props of each component type, as shown to the model
+COMPONENT_SPECS: Dict[str, Dict[str, Any]] = {
+    "hero": {
+        "title": "string",
+        "subtitle": "string",
+        "image": "url_or_empty",
+        "buttonText": "string",
+        "buttonLink": "url_or_empty",
+    },
+    "card": {
+        "title": "string",
+        "content": "string",
+        "image": "url_or_empty",
+        "badge": "string_or_empty",
+    },
+    "gallery": {
+        "title": "string",
+        "images": [{"url": "image_url", "caption": "string"}],
+    },
+    "list": {"title": "string", "items": [{"text": "string", "icon": "emoji"}]},
+    "stats": {
+        "title": "string",
+        "data": [{"value": "string", "label": "string", "icon": "emoji"}],
+    },
+    "testimonial": {
+        "quote": "string",
+        "author": "string",
+        "role": "string",
+        "avatar": "url_or_empty",
+    },
+}
+
+
+class Props(BaseModel):
+    """Props as the frontend renders them: numbers as text, null as empty."""
+
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def null_as_empty(cls, value: Any, info: ValidationInfo) -> Any:
+        if value is None and cls.model_fields[info.field_name].annotation is str:
+            return ""
+        return value
+
+
+class HeroProps(Props):
+    title: str
+    subtitle: str = ""
+    image: str = ""
+    buttonText: str = ""
+    buttonLink: str = ""
+
+
+class CardProps(Props):
+    title: str
+    content: str
+    image: str = ""
+    badge: str = ""
+
+
+class GalleryImage(Props):
+    url: str
+    caption: str = ""
+
+
+class GalleryProps(Props):
+    title: str = ""
+    images: List[GalleryImage]
+
+
+class ListItem(Props):
+    text: str
+    icon: str = ""
+
+
+class ListProps(Props):
+    title: str = ""
+    items: List[ListItem]
+
+
+class StatItem(Props):
+    value: str
+    label: str
+    icon: str = ""
+
+
+class StatsProps(Props):
+    title: str = ""
+    data: List[StatItem]
+
+
+class TestimonialProps(Props):
+    quote: str
+    author: str
+    role: str = ""
+    avatar: str = ""
+
+
+# Props model of each component type; unknown props are dropped
+COMPONENT_MODELS: Dict[str, Type[BaseModel]] = {
+    "hero": HeroProps,
+    "card": CardProps,
+    "gallery": GalleryProps,
+    "list": ListProps,
+    "stats": StatsProps,
+    "testimonial": TestimonialProps,
+}
+
+
+def validate_component(component: Any) -> Optional[Dict[str, Any]]:
+    """The component with validated props, or None if it cannot be rendered."""
+    if not isinstance(component, dict):
+        return None
+    model = COMPONENT_MODELS.get(component.get("type"))
+    if model is None:
+        logger.warning(f"Skipping component of unknown type: {component.get('type')}")
+        return None
+    try:
+        props = model.model_validate(component.get("props") or {})
+    except ValidationError as e:
+        problems = "; ".join(
+            f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+            for error in e.errors()
+        )
+        logger.warning(f"Skipping invalid {component['type']} component: {problems}")
+        return None
+    return {"type": component["type"], "props": props.model_dump()}
+
+
+def component_specs_text() -> str:
+    """The COMPONENT SPECIFICATIONS block of the UI prompts."""
+    return "\n".join(
+        f"{name}: {json.dumps(spec)}" for name, spec in COMPONENT_SPECS.items()
+    )
+
+
+def _value_schema(example: Any) -> Dict[str, Any]:
+    if isinstance(example, list):
+        return {"type": "array", "items": _value_schema(example[0])}
+    if isinstance(example, dict):
+        return {
+            "type": "object",
+            "properties": {key: _value_schema(value) for key, value in example.items()},
+            "required": list(example),
+        }
+    return {"type": "string"}
+
+
+def components_response_schema() -> Dict[str, Any]:
+    """JSON schema of {"components": [...]} for structured output.
+
+    Gemini's response schemas have no per-type unions, so props lists the
+    fields of every type as optional; validate_component drops the ones that
+    do not belong to the component's type.
+    """
+    props: Dict[str, Any] = {}
+    for spec in COMPONENT_SPECS.values():
+        for key, value in spec.items():
+            props.setdefault(key, _value_schema(value))
+
+    return {
+        "type": "object",
+        "properties": {
+            "components": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "type": {"type": "string", "enum": list(COMPONENT_SPECS)},
+                        "props": {"type": "object", "properties": props},
+                    },
+                    "required": ["type", "props"],
+                },
+            }
+        },
+        "required": ["components"],
+    }
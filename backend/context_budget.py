@@ -0,0 +1,75 @@
+"""Token budgets for the context packed into LLM prompts."""
+
+import math
+import re
+from typing import Dict, List, Optional, Sequence
+
+from lexical_index import coverage, query_terms
+
+# Words and single punctuation marks, the units the estimate counts
+PIECE = re.compile(r"\w+|[^\w\s]")
+
+ELLIPSIS = "..."
+
+
+def estimate_tokens(text: str) -> int:
+    """Local estimate of the tokens of a text.
+
+    Gemini's tokenizer is not available offline. Its sub-word pieces average
+    about four characters of a word, and punctuation is a token of its own,
+    which this counts without calling the API.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in PIECE.findall(text))
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cut a text to about max_tokens, at a word boundary where possible."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # Scale a first cut by the text's own characters per token, then trim
+    cut = text[: int(len(text) * max_tokens / estimate_tokens(text))]
+    while cut and estimate_tokens(cut + ELLIPSIS) > max_tokens:
+        cut = cut[: int(len(cut) * 0.9)]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + ELLIPSIS if cut else ""
+
+
+def split_budget(total: int, weights: Dict[str, float]) -> Dict[str, int]:
+    """Share a token budget between prompt sections by weight."""
+    weight_sum = sum(weights.values()) or 1
+    return {name: int(total * weight / weight_sum) for name, weight in weights.items()}
+
+
+def pack(
+    items: Sequence[str],
+    max_tokens: int,
+    query: Optional[str] = None,
+    item_tokens: Optional[int] = None,
+    overhead: int = 1,
+) -> List[str]:
+    """The most relevant items that fit in max_tokens, best first.
+
+    Items are ranked by how many of the query's keywords they contain (in
+    their original order without a query), each cut to item_tokens, and
+    added while they fit. overhead is the tokens added around each item by
+    the caller, e.g. a newline or a numbered label.
+    """
+    terms = query_terms(query) if query else []
+    ranked = sorted(
+        range(len(items)), key=lambda i: -coverage(terms, items[i]) if terms else 0
+    )
+
+    packed, used = [], 0
+    for i in ranked:
+        item = truncate(items[i], item_tokens) if item_tokens else items[i]
+        cost = estimate_tokens(item) + overhead
+        if not item or used + cost > max_tokens:
+            continue
+        packed.append(item)
+        used += cost
+    return packed
@@ -0,0 +1,52 @@
+"""Per-user document-set versions used to invalidate cached results."""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+# Row holding the version of the whole corpus, bumped when everything is cleared
+GLOBAL_KEY = ""
+
+
+class CorpusVersions:
+    """Version counters stored in SQLite so they survive restarts.
+
+    A user's version changes whenever their documents are added or deleted,
+    so anything keyed on it (cached responses, retrievals) goes stale.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS corpus_versions (
+                user_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> int:
+        row = self._conn.execute(
+            "SELECT version FROM corpus_versions WHERE user_id = ?", (key,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, user_id: str) -> str:
+        """Version of the user's document set, including the global version."""
+        with self._lock:
+            return f"{self._get(GLOBAL_KEY)}.{self._get(user_id)}"
+
+    def bump(self, user_id: str):
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO corpus_versions (user_id, version) VALUES (?, 1)
+                ON CONFLICT(user_id) DO UPDATE SET version = version + 1""",
+                (user_id,),
+            )
+            self._conn.commit()
+
+    def bump_all(self):
+        self.bump(GLOBAL_KEY)
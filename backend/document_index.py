@@ -0,0 +1,236 @@
+"""Per-user index of the files stored in the vectorstore."""
+
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from compaction import vacuum_if_fragmented
+
+
+class DocumentIndex:
+    """File metadata and chunk ids in SQLite, kept next to the vectorstore.
+
+    Listing a user's documents reads only that user's rows instead of pulling
+    the whole collection out of Chroma, and the stored chunk ids let a user's
+    or a file's chunks be deleted without scanning it.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                user_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                file_type TEXT,
+                chunk_count INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                uploaded_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, filename)
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(files)")}
+        if "version" not in columns:
+            # Number of times the file has been uploaded
+            self._conn.execute(
+                "ALTER TABLE files ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+            )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                filename TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS chunks_file ON chunks (user_id, filename)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _group(metadatas: Iterable[Dict[str, Any]]) -> Dict[tuple, Dict[str, Any]]:
+        """Aggregate chunk metadata into one entry per (user_id, filename)."""
+        files = defaultdict(lambda: {"chunk_count": 0, "bytes": 0, "file_type": None})
+        for metadata in metadatas:
+            user_id = metadata.get("user_id")
+            if not user_id:
+                continue
+            entry = files[(user_id, metadata.get("filename", "Unknown"))]
+            entry["chunk_count"] += 1
+            entry["bytes"] = metadata.get("file_size", entry["bytes"])
+            entry["file_type"] = metadata.get("file_type", entry["file_type"])
+        return files
+
+    @staticmethod
+    def _chunk_rows(ids: List[str], metadatas: List[Dict[str, Any]]) -> List[tuple]:
+        return [
+            (chunk_id, metadata["user_id"], metadata.get("filename", "Unknown"))
+            for chunk_id, metadata in zip(ids, metadatas)
+            if metadata.get("user_id")
+        ]
+
+    def add_chunks(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Record chunks added to the vectorstore under the given ids."""
+        now = time.time()
+        rows = [
+            (user_id, filename, f["file_type"], f["chunk_count"], f["bytes"], now, now)
+            for (user_id, filename), f in self._group(metadatas).items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                """INSERT INTO files (user_id, filename, file_type, chunk_count, bytes, uploaded_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, filename) DO UPDATE SET
+                    file_type = excluded.file_type,
+                    chunk_count = chunk_count + excluded.chunk_count,
+                    bytes = excluded.bytes,
+                    updated_at = excluded.updated_at""",
+                rows,
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)",
+                self._chunk_rows(ids, metadatas),
+            )
+            self._conn.commit()
+
+    def replace_files(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Record the chunks of a new version of each file, replacing the old ones."""
+        now = time.time()
+        files = self._group(metadatas)
+        with self._lock:
+            for (user_id, filename), f in files.items():
+                self._conn.execute(
+                    "DELETE FROM chunks WHERE user_id = ? AND filename = ?",
+                    (user_id, filename),
+                )
+                self._conn.execute(
+                    """INSERT INTO files (user_id, filename, file_type, chunk_count, bytes, uploaded_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(user_id, filename) DO UPDATE SET
+                        file_type = excluded.file_type,
+                        chunk_count = excluded.chunk_count,
+                        bytes = excluded.bytes,
+                        updated_at = excluded.updated_at,
+                        version = version + 1""",
+                    (
+                        user_id,
+                        filename,
+                        f["file_type"],
+                        f["chunk_count"],
+                        f["bytes"],
+                        now,
+                        now,
+                    ),
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)",
+                self._chunk_rows(ids, metadatas),
+            )
+            self._conn.commit()
+
+    def rebuild(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Replace the index with the chunk ids and metadata of the whole collection."""
+        now = time.time()
+        rows = [
+            (user_id, filename, f["file_type"], f["chunk_count"], f["bytes"], now, now)
+            for (user_id, filename), f in self._group(metadatas).items()
+        ]
+        with self._lock:
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.executemany(
+                """INSERT INTO files (user_id, filename, file_type, chunk_count, bytes, uploaded_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)",
+                self._chunk_rows(ids, metadatas),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    @staticmethod
+    def _file_filter(user_id: str, filename: Optional[str]):
+        if filename is None:
+            return "user_id = ?", (user_id,)
+        return "user_id = ? AND filename = ?", (user_id, filename)
+
+    def chunk_ids(self, user_id: str, filename: Optional[str] = None) -> List[str]:
+        """Ids of a user's chunks, or of one of their files."""
+        where, params = self._file_filter(user_id, filename)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT chunk_id FROM chunks WHERE {where}", params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def remove(self, user_id: str, filename: Optional[str] = None) -> int:
+        """Forget a user's files, or one of them; returns the files removed."""
+        where, params = self._file_filter(user_id, filename)
+        with self._lock:
+            self._conn.execute(f"DELETE FROM chunks WHERE {where}", params)
+            removed = self._conn.execute(f"DELETE FROM files WHERE {where}", params)
+            self._conn.commit()
+        return removed.rowcount
+
+    def compact(self) -> bool:
+        with self._lock:
+            return vacuum_if_fragmented(self._conn)
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM files LIMIT 1").fetchone() is None
+
+    def list_files(
+        self, user_id: str, limit: Optional[int] = None, offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """A user's files, most recently updated first."""
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT filename, file_type, chunk_count, bytes, version, uploaded_at, updated_at
+                FROM files WHERE user_id = ?
+                ORDER BY updated_at DESC, filename
+                LIMIT ? OFFSET ?""",
+                (user_id, -1 if limit is None else limit, offset),
+            ).fetchall()
+        return [
+            {
+                "filename": filename,
+                "file_type": file_type,
+                "chunks": chunk_count,
+                "bytes": size,
+                "version": version,
+                "uploaded_at": uploaded_at,
+                "updated_at": updated_at,
+            }
+            for filename, file_type, chunk_count, size, version, uploaded_at, updated_at in rows
+        ]
+
+    def user_totals(self, user_id: str) -> Dict[str, int]:
+        with self._lock:
+            files, chunks, size = self._conn.execute(
+                """SELECT COUNT(*), COALESCE(SUM(chunk_count), 0), COALESCE(SUM(bytes), 0)
+                FROM files WHERE user_id = ?""",
+                (user_id,),
+            ).fetchone()
+        return {"file_count": files, "total_chunks": chunks, "total_bytes": size}
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            users, files, chunks = self._conn.execute(
+                """SELECT COUNT(DISTINCT user_id), COUNT(*), COALESCE(SUM(chunk_count), 0)
+                FROM files"""
+            ).fetchone()
+        return {"users": users, "files": files, "chunks": chunks}
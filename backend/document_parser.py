@@ -0,0 +1,76 @@
+"""Document loading and chunking.
+
+Kept free of API clients so it can run inside ingestion worker processes.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import List
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Text splitter
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=1000,
+    chunk_overlap=200,
+    length_function=len,
+    separators=["\n\n", "\n", " ", ""],
+)
+
+
+def load_document(file_path: str, filename: str, user_id: str) -> List[Document]:
+    """Load a single document and split it into chunks.
+
+    Raises ValueError for unsupported file types; loader errors propagate.
+    """
+    file_ext = Path(filename).suffix.lower()
+
+    # Choose appropriate loader based on file type. Loaders are imported on
+    # first use since PyPDF and Unstructured are slow to import.
+    if file_ext == ".pdf":
+        from langchain_community.document_loaders import PyPDFLoader
+
+        loader = PyPDFLoader(file_path)
+    elif file_ext == ".txt":
+        from langchain_community.document_loaders import TextLoader
+
+        loader = TextLoader(file_path, encoding="utf-8")
+    elif file_ext == ".docx":
+        from langchain_community.document_loaders import (
+            UnstructuredWordDocumentLoader,
+        )
+
+        loader = UnstructuredWordDocumentLoader(file_path)
+    elif file_ext == ".pptx":
+        from langchain_community.document_loaders import (
+            UnstructuredPowerPointLoader,
+        )
+
+        loader = UnstructuredPowerPointLoader(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+    # Load documents
+    documents = loader.load()
+
+    # Add metadata
+    file_size = os.path.getsize(file_path)
+    for doc in documents:
+        doc.metadata.update(
+            {
+                "user_id": user_id,
+                "filename": filename,
+                "file_type": file_ext,
+                "file_size": file_size,
+            }
+        )
+
+    # Split documents
+    doc_splits = text_splitter.split_documents(documents)
+
+    logger.info(f"Loaded {filename}: {len(doc_splits)} chunks created")
+    return doc_splits
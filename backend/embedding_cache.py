@@ -0,0 +1,281 @@
+"""Content-addressed cache for document and query embeddings."""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+from compaction import vacuum_if_fragmented
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store keyed by a hash of model name and text.
+
+    Entries carry a last-used timestamp so the cache can be bounded with LRU
+    eviction once it grows past max_entries.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Look up several keys at once, returning only the hits."""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Store embeddings and evict the least recently used overflow."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, array("f", vector).tobytes(), now)
+                    for key, vector in items.items()
+                ],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                """DELETE FROM embeddings WHERE key IN (
+                    SELECT key FROM embeddings ORDER BY last_used LIMIT ?
+                )""",
+                (overflow,),
+            )
+            logger.info(f"Evicted {overflow} embeddings from cache")
+
+    def compact(self) -> bool:
+        with self._lock:
+            return vacuum_if_fragmented(self._conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (entries,) = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalize_query(text: str) -> str:
+    """Normalize case and whitespace so near-identical queries share a vector."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model.
+
+    Document vectors are cached in the SQLite store. Query vectors are kept in
+    an in-memory LRU in front of the same store, keyed by the normalized query,
+    so repeated agent searches never reach the network. With query_task_type
+    set, several queries are embedded in one batched call.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        model: str,
+        query_cache_size: int = 1024,
+        query_task_type: Optional[str] = None,
+    ):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+        self.query_cache_size = query_cache_size
+        self.query_task_type = query_task_type
+        self.query_hits = 0
+        self.query_misses = 0
+
+        self._queries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+    def _lookup(self, texts: List[str]):
+        keys = [EmbeddingCache.make_key(self.model, text) for text in texts]
+        cached = self.cache.get_many(keys)
+        # Embed each distinct missing text once
+        missing = list(
+            dict.fromkeys(text for text, key in zip(texts, keys) if key not in cached)
+        )
+        return keys, cached, missing
+
+    def _merge(self, keys, cached, missing, vectors) -> List[List[float]]:
+        new_items = {
+            EmbeddingCache.make_key(self.model, text): vector
+            for text, vector in zip(missing, vectors)
+        }
+        self.cache.put_many(new_items)
+        cached.update(new_items)
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = self._lookup(texts)
+        vectors = self.embeddings.embed_documents(missing) if missing else []
+        return self._merge(keys, cached, missing, vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = self._lookup(texts)
+        vectors = await self.embeddings.aembed_documents(missing) if missing else []
+        return self._merge(keys, cached, missing, vectors)
+
+    def _lookup_queries(self, texts: List[str]):
+        normalized = [normalize_query(text) for text in texts]
+        unique = list(dict.fromkeys(normalized))
+        if self.query_cache_size <= 0:
+            return normalized, {}, unique
+
+        with self._queries_lock:
+            found = {
+                query: self._queries[query]
+                for query in unique
+                if query in self._queries
+            }
+            for query in found:
+                self._queries.move_to_end(query)
+
+        # Fall back to the shared store, filled by other workers and restarts
+        keys = {query: self._query_key(query) for query in unique if query not in found}
+        if keys:
+            stored = self.cache.get_many(list(keys.values()))
+            from_store = {q: stored[key] for q, key in keys.items() if key in stored}
+            self._remember_queries(from_store)
+            found.update(from_store)
+
+        hits = sum(1 for query in normalized if query in found)
+        self.query_hits += hits
+        self.query_misses += len(normalized) - hits
+        missing = [query for query in unique if query not in found]
+        return normalized, found, missing
+
+    def _query_key(self, query: str) -> str:
+        # Query and document embeddings of the same text differ
+        return EmbeddingCache.make_key(f"{self.model}#query", query)
+
+    def _remember_queries(self, vectors: Dict[str, List[float]]):
+        with self._queries_lock:
+            for query, vector in vectors.items():
+                self._queries[query] = vector
+                self._queries.move_to_end(query)
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+
+    def _merge_queries(self, normalized, found, missing, vectors) -> List[List[float]]:
+        new_vectors = dict(zip(missing, vectors))
+        self._remember_queries(new_vectors)
+        self.cache.put_many(
+            {self._query_key(query): vector for query, vector in new_vectors.items()}
+        )
+        found.update(new_vectors)
+        return [found[query] for query in normalized]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, with the cache misses in one call when possible."""
+        normalized, found, missing = self._lookup_queries(texts)
+        if not missing:
+            vectors = []
+        elif self.query_task_type and len(missing) > 1:
+            vectors = self.embeddings.embed_documents(
+                missing, task_type=self.query_task_type
+            )
+        else:
+            vectors = [self.embeddings.embed_query(query) for query in missing]
+        return self._merge_queries(normalized, found, missing, vectors)
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Async version of embed_queries()."""
+        normalized, found, missing = self._lookup_queries(texts)
+        if not missing:
+            vectors = []
+        elif self.query_task_type and len(missing) > 1:
+            vectors = await self.embeddings.aembed_documents(
+                missing, task_type=self.query_task_type
+            )
+        else:
+            vectors = [await self.embeddings.aembed_query(query) for query in missing]
+        return self._merge_queries(normalized, found, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    def query_cache_stats(self) -> Dict[str, Any]:
+        lookups = self.query_hits + self.query_misses
+        return {
+            "entries": len(self._queries),
+            "max_entries": self.query_cache_size,
+            "hits": self.query_hits,
+            "misses": self.query_misses,
+            "hit_rate": self.query_hits / lookups if lookups else 0.0,
+        }
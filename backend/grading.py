@@ -0,0 +1,190 @@
+"""Relevance grading for retrieved RAG chunks."""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
+
+logger = logging.getLogger(__name__)
+
+GRADING_MODES = ("batch", "multi", "threshold")
+
+RETRIEVAL_GRADER_PROMPT = PromptTemplate(
+    template="""You are a grader assessing relevance of a retrieved document to a user question.
+    If the document contains information related to the user question, grade it as relevant.
+    The goal is to filter out erroneous retrievals.
+
+    Give a binary score 'yes' or 'no' to indicate whether the document is relevant to the question.
+    Provide the binary score as a JSON with a single key 'score' and no preamble or explanation.
+
+    Here is the retrieved document: {document}
+    Here is the user question: {question}""",
+    input_variables=["question", "document"],
+)
+
+MULTI_DOC_GRADER_PROMPT = PromptTemplate(
+    template="""You are a grader assessing relevance of retrieved documents to a user question.
+    If a document contains information related to the user question, grade it as relevant.
+    The goal is to filter out erroneous retrievals.
+
+    Give a binary score 'yes' or 'no' for EVERY document, in the order they are listed.
+    Provide the scores as a JSON with a single key 'scores' holding a list of {count} strings and no preamble or explanation.
+
+    Here are the retrieved documents:
+    {documents}
+
+    Here is the user question: {question}""",
+    input_variables=["question", "documents", "count"],
+)
+
+# (document, relevance score in [0, 1]) as returned by the vectorstore; None
+# for documents found only by keyword search, which always go to the LLM
+ScoredDocument = Tuple[Document, Optional[float]]
+
+
+class RelevanceGrader:
+    """Grades retrieved documents against a question.
+
+    Modes:
+    - batch: one grader call per document, all sent at once (capped by max_concurrency)
+    - multi: every document graded in a single multi-document prompt
+    - threshold: embedding similarity decides clear cases, the LLM only grades the rest
+    """
+
+    def __init__(
+        self,
+        llm,
+        mode: str = "batch",
+        max_concurrency: int = 5,
+        low_threshold: float = 0.3,
+        high_threshold: float = 0.75,
+    ):
+        if mode not in GRADING_MODES:
+            raise ValueError(
+                f"Unknown grading mode: {mode}. Supported: {', '.join(GRADING_MODES)}"
+            )
+
+        self.mode = mode
+        self.max_concurrency = max_concurrency
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+
+        self.single_grader = RETRIEVAL_GRADER_PROMPT | llm | JsonOutputParser()
+        self.multi_grader = MULTI_DOC_GRADER_PROMPT | llm | JsonOutputParser()
+
+    def _triage(
+        self, scored_docs: Sequence[ScoredDocument]
+    ) -> Tuple[Dict[int, bool], List[int]]:
+        """Split documents into already-decided verdicts and ones that need the LLM."""
+        if self.mode != "threshold":
+            return {}, list(range(len(scored_docs)))
+
+        decided = {}
+        pending = []
+        for i, (_, score) in enumerate(scored_docs):
+            if score is None:
+                pending.append(i)
+            elif score >= self.high_threshold:
+                decided[i] = True
+            elif score <= self.low_threshold:
+                decided[i] = False
+            else:
+                pending.append(i)
+        return decided, pending
+
+    def _single_inputs(
+        self, question: str, scored_docs: Sequence[ScoredDocument], pending: List[int]
+    ) -> List[Dict[str, Any]]:
+        return [
+            {"question": question, "document": scored_docs[i][0].page_content}
+            for i in pending
+        ]
+
+    def _multi_input(
+        self, question: str, scored_docs: Sequence[ScoredDocument], pending: List[int]
+    ) -> Dict[str, Any]:
+        documents = "\n\n".join(
+            f"Document {n + 1}: {scored_docs[i][0].page_content}"
+            for n, i in enumerate(pending)
+        )
+        return {"question": question, "documents": documents, "count": len(pending)}
+
+    @staticmethod
+    def _single_verdicts(pending: List[int], grades: List[Any]) -> Dict[int, bool]:
+        verdicts = {}
+        for i, grade in zip(pending, grades):
+            if isinstance(grade, Exception):
+                logger.warning(f"Error grading document: {str(grade)}")
+                # Include document if grading fails
+                verdicts[i] = True
+            else:
+                verdicts[i] = grade.get("score") == "yes"
+        return verdicts
+
+    @staticmethod
+    def _multi_verdicts(pending: List[int], grade: Any) -> Dict[int, bool]:
+        scores = grade.get("scores") if isinstance(grade, dict) else None
+        if not isinstance(scores, list) or len(scores) != len(pending):
+            logger.warning("Multi-document grader returned malformed scores")
+            # Include documents if grading fails
+            return {i: True for i in pending}
+        return {i: score == "yes" for i, score in zip(pending, scores)}
+
+    @staticmethod
+    def _select(
+        scored_docs: Sequence[ScoredDocument], verdicts: Dict[int, bool]
+    ) -> List[Document]:
+        # Keep the vectorstore ranking order
+        return [doc for i, (doc, _) in enumerate(scored_docs) if verdicts.get(i)]
+
+    def grade(
+        self, question: str, scored_docs: Sequence[ScoredDocument]
+    ) -> List[Document]:
+        """Return the relevant documents, grading them concurrently."""
+        verdicts, pending = self._triage(scored_docs)
+
+        if pending and self.mode == "multi":
+            try:
+                grade = self.multi_grader.invoke(
+                    self._multi_input(question, scored_docs, pending)
+                )
+            except Exception as e:
+                grade = None
+                logger.warning(f"Error grading documents: {str(e)}")
+            verdicts.update(self._multi_verdicts(pending, grade))
+        elif pending:
+            grades = self.single_grader.batch(
+                self._single_inputs(question, scored_docs, pending),
+                config={"max_concurrency": self.max_concurrency},
+                return_exceptions=True,
+            )
+            verdicts.update(self._single_verdicts(pending, grades))
+
+        return self._select(scored_docs, verdicts)
+
+    async def agrade(
+        self, question: str, scored_docs: Sequence[ScoredDocument]
+    ) -> List[Document]:
+        """Async version of grade() that never blocks the event loop."""
+        verdicts, pending = self._triage(scored_docs)
+
+        if pending and self.mode == "multi":
+            try:
+                grade = await self.multi_grader.ainvoke(
+                    self._multi_input(question, scored_docs, pending)
+                )
+            except Exception as e:
+                grade = None
+                logger.warning(f"Error grading documents: {str(e)}")
+            verdicts.update(self._multi_verdicts(pending, grade))
+        elif pending:
+            grades = await self.single_grader.abatch(
+                self._single_inputs(question, scored_docs, pending),
+                config={"max_concurrency": self.max_concurrency},
+                return_exceptions=True,
+            )
+            verdicts.update(self._single_verdicts(pending, grades))
+
+        return self._select(scored_docs, verdicts)
@@ -0,0 +1,81 @@
+"""Background image generation, off the LLM's critical path and context."""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from image_store import ImageStore
+from response_cache import ResponseCache, normalize_prompt
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class ImageGenerator:
+    """Generates images concurrently in a bounded pool.
+
+    submit() returns a short handle right away; the LLM only ever sees the
+    handle, never the image. Images land in the image store and are cached
+    on disk by normalized prompt, so a prompt is generated once. Identical
+    prompts submitted while one is running share it.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str], Awaitable[bytes]],
+        store: ImageStore,
+        cache: ResponseCache,
+        concurrency: int = 2,
+        model: str = "",
+    ):
+        self.generate = generate
+        self.store = store
+        self.cache = cache
+        self.model = model
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight = SingleFlight()
+        self.metrics = {"submitted": 0, "generated": 0, "failures": 0}
+
+    def handle(self, prompt: str) -> str:
+        payload = json.dumps([self.model, normalize_prompt(prompt)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def submit(self, prompt: str) -> str:
+        """Start generating an image unless it exists, and return its handle."""
+        handle = self.handle(prompt)
+        self.metrics["submitted"] += 1
+        if self.cache.get(handle) is None:
+            self._in_flight.start(handle, lambda: self._generate(handle, prompt))
+        return handle
+
+    async def _generate(self, handle: str, prompt: str):
+        async with self._semaphore:
+            try:
+                data = await self.generate(prompt)
+            except Exception as e:
+                self.metrics["failures"] += 1
+                logger.warning(f"Image generation failed for '{prompt}': {e}")
+                return
+        self.cache.set(handle, {"hash": self.store.put(data, "image/jpeg")})
+        self.metrics["generated"] += 1
+
+    def url(self, handle: str) -> Optional[str]:
+        """URL of a finished image, None while pending or if it failed."""
+        cached = self.cache.get(handle)
+        return self.store.url(cached["hash"]) if cached else None
+
+    async def wait(self, handles: Iterable[str], timeout: float) -> Dict[str, str]:
+        """URLs of the images ready within the timeout, by handle."""
+        handles = list(handles)
+        pending = [self._in_flight.get(h) for h in handles]
+        pending = [task for task in pending if task is not None]
+        if pending and timeout > 0:
+            # Not cancelled on timeout, late images still fill the cache
+            await asyncio.wait(pending, timeout=timeout)
+        urls = {handle: self.url(handle) for handle in handles}
+        return {handle: url for handle, url in urls.items() if url}
+
+    def stats(self):
+        return {**self.metrics, "in_flight": len(self._in_flight)}
@@ -0,0 +1,126 @@
+"""Content-addressed store for images served out of band from UI responses."""
+
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# File extension of each stored image type
+EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+IMAGE_HASH = re.compile(r"^[0-9a-f]{64}$")
+PLACEHOLDER = re.compile(r"\[GENERATED_IMAGE:(.*?)\]")
+DATA_URL = re.compile(r"^data:(image/[\w.+-]+);base64,(.+)$", re.DOTALL)
+
+
+class ImageStore:
+    """Images on disk named by the SHA-256 of their bytes.
+
+    The same image is stored once however often it is generated, and its URL
+    never changes content, so clients can cache it forever.
+    """
+
+    def __init__(self, directory: str, url_prefix: str = "/api/images"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.url_prefix = url_prefix
+
+    def put(self, data: bytes, mime_type: str = "image/jpeg") -> str:
+        """Store image bytes and return their hash."""
+        image_hash = hashlib.sha256(data).hexdigest()
+        path = self.directory / f"{image_hash}{EXTENSIONS.get(mime_type, '.jpg')}"
+        if not path.exists():
+            # Written aside and renamed, so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return image_hash
+
+    def put_data_url(self, data_url: str) -> Optional[str]:
+        """Store the image of a base64 data: URL and return its URL."""
+        match = DATA_URL.match(data_url)
+        if not match:
+            return None
+        try:
+            data = base64.b64decode(match.group(2), validate=True)
+        except binascii.Error:
+            logger.warning("Dropping image with invalid base64 data")
+            return None
+        return self.url(self.put(data, match.group(1)))
+
+    def find(self, image_hash: str) -> Optional[Tuple[Path, str]]:
+        """Path and MIME type of a stored image, None if unknown."""
+        if not IMAGE_HASH.match(image_hash):
+            return None
+        for mime_type, extension in EXTENSIONS.items():
+            path = self.directory / f"{image_hash}{extension}"
+            if path.exists():
+                return path, mime_type
+        return None
+
+    def url(self, image_hash: str) -> str:
+        return f"{self.url_prefix}/{image_hash}"
+
+    def with_base_url(self, node: Any, base_url: str) -> Any:
+        """Make the image URLs anywhere in a response absolute.
+
+        URLs are stored relative to the API, so cached responses do not depend
+        on the host; the frontend is served from another origin and needs the
+        API's. Returns a new tree.
+        """
+        if isinstance(node, dict):
+            return {
+                key: self.with_base_url(value, base_url) for key, value in node.items()
+            }
+        if isinstance(node, list):
+            return [self.with_base_url(item, base_url) for item in node]
+        if isinstance(node, str) and node.startswith(f"{self.url_prefix}/"):
+            return base_url.rstrip("/") + node
+        return node
+
+    def resolve(self, node: Any, generated_images: Dict[str, str]) -> Any:
+        """Rewrite image references anywhere in a component tree.
+
+        [GENERATED_IMAGE:prompt] placeholders become the generated image's URL
+        (or empty if there is none), and inline image data: URLs are moved into
+        the store and replaced by their URL. Other strings are left as they
+        are. Returns a new tree.
+        """
+        if isinstance(node, dict):
+            return {
+                key: self.resolve(value, generated_images)
+                for key, value in node.items()
+            }
+        if isinstance(node, list):
+            return [self.resolve(item, generated_images) for item in node]
+        if not isinstance(node, str):
+            return node
+
+        if DATA_URL.match(node):
+            return self.put_data_url(node) or ""
+        if "[GENERATED_IMAGE:" in node:
+            return PLACEHOLDER.sub(
+                lambda match: self._generated_url(generated_images, match.group(1)),
+                node,
+            )
+        return node
+
+    def _generated_url(self, generated_images: Dict[str, str], prompt: str) -> str:
+        image = generated_images.get(prompt, "")
+        # Older entries may still hold the image itself
+        if DATA_URL.match(image):
+            return self.put_data_url(image) or ""
+        return image
@@ -0,0 +1,310 @@
+"""Background ingestion pipeline for uploaded documents.
+
+Uploads are turned into jobs. Parsing runs in a process pool because the
+PDF/Office parsers are CPU-bound and hold the GIL; the resulting chunks are
+embedded and stored by async workers that batch chunks across files. A file
+that was uploaded before replaces its previous version, and only the chunks
+that changed are embedded.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from rag_manager import rag_manager
+
+logger = logging.getLogger(__name__)
+
+# Parser processes per server worker, sharing the cores between workers
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+INGESTION_WORKERS = int(
+    os.getenv(
+        "INGESTION_WORKERS", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))
+    )
+)
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+MAX_TRACKED_JOBS = 1000
+INGESTION_JOBS_PATH = os.getenv("INGESTION_JOBS_PATH", "./cache_data/ingestion_jobs.db")
+
+
+class FileProgress:
+    """Progress of a single file within an ingestion job."""
+
+    def __init__(self, filename: str, path: str):
+        self.filename = filename
+        self.path = path
+        self.status = "queued"  # queued -> parsing -> embedding -> done | error
+        self.message = "Waiting to be processed"
+        self.chunks = 0
+        # Upload order, the latest upload of a file is the one stored
+        self.version = 0
+        # Filled in once stored, relative to the previous version of the file
+        self.changes: Dict[str, int] = {}
+
+    def fail(self, message: str):
+        self.status = "error"
+        self.message = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "filename": self.filename,
+            "status": self.status,
+            "message": self.message,
+            "chunks_created": self.chunks,
+            **self.changes,
+        }
+
+
+class IngestionJob:
+    """A batch of files uploaded together by one user."""
+
+    def __init__(self, user_id: str, files: List[FileProgress]):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.files = files
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        statuses = {file.status for file in self.files}
+        if statuses <= {"done", "error"}:
+            return "failed" if statuses == {"error"} else "completed"
+        if statuses == {"queued"}:
+            return "queued"
+        return "processing"
+
+    def update_finished(self):
+        if self.finished_at is None and self.status in ("completed", "failed"):
+            self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "files": [file.to_dict() for file in self.files],
+            "files_done": sum(1 for file in self.files if file.status == "done"),
+            "total_files": len(self.files),
+            "total_chunks": sum(file.chunks for file in self.files),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobStore:
+    """Snapshots of job progress in SQLite, readable from every server worker."""
+
+    def __init__(self, path: str, max_jobs: int = MAX_TRACKED_JOBS):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                job_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def save(self, job: IngestionJob):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingestion_jobs (job_id, data, created_at) VALUES (?, ?, ?)",
+                (job.id, json.dumps(job.to_dict()), job.created_at),
+            )
+            self._conn.commit()
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM ingestion_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune(self):
+        with self._lock:
+            self._conn.execute(
+                """DELETE FROM ingestion_jobs WHERE job_id NOT IN (
+                    SELECT job_id FROM ingestion_jobs ORDER BY created_at DESC LIMIT ?
+                )""",
+                (self.max_jobs,),
+            )
+            self._conn.commit()
+
+
+class IngestionQueue:
+    """Parses files in a process pool and embeds them in batched async workers."""
+
+    def __init__(self):
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        # Another server worker may be asked for the status of our jobs
+        self.store = JobStore(INGESTION_JOBS_PATH)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._embed_queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._tasks = set()
+        # Latest upload version of each (user_id, filename) still in the pipeline
+        self._versions = itertools.count(1)
+        self._latest: Dict[Tuple[str, str], int] = {}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn rather than fork: the server process holds gRPC and
+            # SQLite handles that are not fork-safe
+            self._pool = ProcessPoolExecutor(
+                max_workers=INGESTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def _ensure_workers(self):
+        if self._embed_queue is None:
+            self._embed_queue = asyncio.Queue()
+            self._workers = [
+                asyncio.create_task(self._embed_worker())
+                for _ in range(EMBEDDING_WORKERS)
+            ]
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Progress of a job started by any server worker."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.store.load(job_id)
+
+    def _update(self, job: IngestionJob):
+        job.update_finished()
+        try:
+            self.store.save(job)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not save progress of job {job.id}: {e}")
+
+    def submit(self, user_id: str, files: List[Tuple[str, str]]) -> IngestionJob:
+        """Queue (filename, path) pairs for ingestion; the files are deleted when done."""
+        job = IngestionJob(user_id, [FileProgress(name, path) for name, path in files])
+
+        self.jobs[job.id] = job
+        while len(self.jobs) > MAX_TRACKED_JOBS:
+            self.jobs.popitem(last=False)
+        self._update(job)
+        self.store.prune()
+
+        self._ensure_workers()
+        for file in job.files:
+            file.version = next(self._versions)
+            self._latest[(user_id, file.filename)] = file.version
+            task = asyncio.create_task(self._parse(job, file))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        logger.info(f"Queued ingestion job {job.id} with {len(files)} files")
+        return job
+
+    async def _parse(self, job: IngestionJob, file: FileProgress):
+        import document_parser
+
+        file.status = "parsing"
+        file.message = "Extracting text"
+        self._update(job)
+        try:
+            loop = asyncio.get_running_loop()
+            documents = await loop.run_in_executor(
+                self._get_pool(),
+                document_parser.load_document,
+                file.path,
+                file.filename,
+                job.user_id,
+            )
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A parser crashed its worker, start a fresh pool for later files
+                self._pool = None
+            logger.error(f"Error processing file {file.filename}: {str(e)}")
+            file.fail(f"Processing failed: {str(e)}")
+            self._finish(job, file)
+            return
+        finally:
+            os.unlink(file.path)
+
+        if not documents:
+            file.fail("Failed to extract text from document")
+            self._finish(job, file)
+            return
+
+        file.chunks = len(documents)
+        file.status = "embedding"
+        file.message = f"Embedding {len(documents)} chunks"
+        self._update(job)
+        await self._embed_queue.put((job, file, documents))
+
+    def _is_superseded(self, job: IngestionJob, file: FileProgress) -> bool:
+        return self._latest.get((job.user_id, file.filename), 0) > file.version
+
+    def _finish(self, job: IngestionJob, file: FileProgress):
+        if self._latest.get((job.user_id, file.filename)) == file.version:
+            del self._latest[(job.user_id, file.filename)]
+        self._update(job)
+
+    async def _embed_worker(self):
+        while True:
+            batch = [await self._embed_queue.get()]
+            chunk_count = len(batch[0][2])
+
+            # Batch whatever else is ready to cut embedding round-trips
+            while chunk_count < EMBEDDING_BATCH_SIZE and not self._embed_queue.empty():
+                item = self._embed_queue.get_nowait()
+                batch.append(item)
+                chunk_count += len(item[2])
+
+            # Older uploads of a file that was uploaded again are not stored,
+            # in this batch or any other
+            superseded = [item for item in batch if self._is_superseded(*item[:2])]
+            current = [item for item in batch if not self._is_superseded(*item[:2])]
+
+            try:
+                documents = [doc for _, _, docs in current for doc in docs]
+                changes = await rag_manager.aupdate_file_documents(documents)
+            except Exception as e:
+                logger.error(f"Embedding worker failed: {str(e)}")
+                changes = None
+
+            for job, file, docs in superseded:
+                file.status = "done"
+                file.message = "Replaced by a newer upload of the same file"
+                self._finish(job, file)
+                self._embed_queue.task_done()
+
+            for job, file, docs in current:
+                if changes is not None:
+                    file.changes = changes.get((job.user_id, file.filename), {})
+                    file.status = "done"
+                    file.message = (
+                        f"Processed into {len(docs)} chunks "
+                        f"({file.changes.get('chunks_added', 0)} new, "
+                        f"{file.changes.get('chunks_removed', 0)} removed)"
+                    )
+                else:
+                    file.fail("Failed to add documents to vectorstore")
+                self._finish(job, file)
+                self._embed_queue.task_done()
+
+
+# Global instance
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,80 @@
+"""Lazy initialization of heavy clients and models.
+
+Module-level singletons (API clients, the vectorstore, the compiled graph)
+are wrapped in Lazy so importing the app stays cheap. They are built on first
+use, or ahead of time by warm_up() during application startup.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Every Lazy created, in creation order, so they can all be warmed up
+registry: List["Lazy"] = []
+
+
+class Lazy:
+    """Proxy that builds its object on first attribute access."""
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+        self._init_seconds = None
+        registry.append(self)
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def get_instance(self) -> Any:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start = time.perf_counter()
+                    self._instance = self._factory()
+                    self._init_seconds = time.perf_counter() - start
+                    logger.info(
+                        f"Initialized {self._name} in {self._init_seconds:.2f}s"
+                    )
+        return self._instance
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.get_instance(), attr)
+
+    def __repr__(self) -> str:
+        state = "initialized" if self.initialized else "pending"
+        return f"Lazy({self._name}, {state})"
+
+
+async def warm_up():
+    """Build every registered object concurrently in worker threads."""
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(asyncio.to_thread(lazy.get_instance) for lazy in registry),
+        return_exceptions=True,
+    )
+    for lazy, result in zip(registry, results):
+        if isinstance(result, Exception):
+            logger.error(f"Warmup of {lazy._name} failed: {result}")
+    logger.info(f"Warmup finished in {time.perf_counter() - start:.2f}s")
+
+
+def status() -> Dict[str, Any]:
+    """Initialization state of every registered object."""
+    return {
+        lazy._name: {
+            "initialized": lazy.initialized,
+            "init_seconds": lazy._init_seconds,
+        }
+        for lazy in registry
+    }
+
+
+def all_initialized() -> bool:
+    return all(lazy.initialized for lazy in registry)
@@ -0,0 +1,161 @@
+"""Keyword (BM25) index over the vectorstore chunks."""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional, Sequence, Set, Tuple
+
+from langchain_core.documents import Document
+
+from compaction import vacuum_if_fragmented
+
+TOKEN = re.compile(r"\w+")
+
+# Dropped from queries so coverage reflects the terms that matter
+STOPWORDS = frozenset(
+    """a an and are as at be by can do does for from how i in is it me my of on
+    or the this to was what when where which who why with you your about explain
+    tell give show""".split()
+)
+
+
+def query_terms(text: str) -> List[str]:
+    """Distinct lowercase keywords of a query, in order."""
+    terms = (token.lower() for token in TOKEN.findall(text))
+    return list(dict.fromkeys(t for t in terms if t not in STOPWORDS))
+
+
+def coverage(terms: Sequence[str], text: str) -> float:
+    """Fraction of the query terms that occur in a text."""
+    if not terms:
+        return 0.0
+    tokens: Set[str] = {token.lower() for token in TOKEN.findall(text)}
+    return sum(1 for term in terms if term in tokens) / len(terms)
+
+
+def _user_key(user_id: str) -> str:
+    # A single alphanumeric token, however the user id is spelled
+    return "u" + hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:24]
+
+
+class LexicalIndex:
+    """SQLite FTS5 index ranked with BM25.
+
+    Chunk text and metadata live in a plain table keyed by chunk id, so results
+    are returned without touching the vectorstore and deletes by id are index
+    lookups. The user id is indexed as a token, so a user's chunks are matched
+    without scanning other users' hits.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS lexical_chunks (
+                id INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                user_key TEXT NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS lexical_fts USING fts5(
+                content, user_key, content='lexical_chunks', content_rowid='id'
+            );
+            -- Keep the FTS index in step with the content table
+            CREATE TRIGGER IF NOT EXISTS lexical_chunks_ai AFTER INSERT ON lexical_chunks
+            BEGIN
+                INSERT INTO lexical_fts (rowid, content, user_key)
+                VALUES (new.id, new.content, new.user_key);
+            END;
+            CREATE TRIGGER IF NOT EXISTS lexical_chunks_ad AFTER DELETE ON lexical_chunks
+            BEGIN
+                INSERT INTO lexical_fts (lexical_fts, rowid, content, user_key)
+                VALUES ('delete', old.id, old.content, old.user_key);
+            END;
+            """
+        )
+        self._conn.commit()
+
+    def _delete(self, ids: Sequence[str]):
+        # Stay below SQLite's bound parameter limit
+        for start in range(0, len(ids), 500):
+            batch = ids[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(
+                f"DELETE FROM lexical_chunks WHERE chunk_id IN ({placeholders})", batch
+            )
+
+    def add(self, ids: Sequence[str], documents: Sequence[Document]):
+        """Index chunks, replacing any already stored under the same ids."""
+        rows = [
+            (
+                chunk_id,
+                _user_key(doc.metadata.get("user_id", "")),
+                doc.page_content,
+                json.dumps(doc.metadata),
+            )
+            for chunk_id, doc in zip(ids, documents)
+        ]
+        with self._lock:
+            self._delete(list(ids))
+            self._conn.executemany(
+                "INSERT INTO lexical_chunks (chunk_id, user_key, content, metadata) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock:
+            self._delete(list(ids))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM lexical_chunks")
+            self._conn.commit()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM lexical_chunks LIMIT 1").fetchone()
+        return row is None
+
+    def search(
+        self, query: str, user_id: Optional[str] = None, k: int = 3
+    ) -> List[Tuple[Document, float]]:
+        """Top-k chunks matching any query term, best BM25 score first."""
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        match = "content : (" + " OR ".join(f'"{term}"' for term in terms) + ")"
+        if user_id:
+            match = f'user_key : "{_user_key(user_id)}" AND {match}'
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT c.content, c.metadata, bm25(lexical_fts, 1.0, 0.0)
+                FROM lexical_fts JOIN lexical_chunks c ON c.id = lexical_fts.rowid
+                WHERE lexical_fts MATCH ?
+                ORDER BY bm25(lexical_fts, 1.0, 0.0)
+                LIMIT ?""",
+                (match, k),
+            ).fetchall()
+        # FTS5 reports BM25 negated so that smaller sorts first
+        return [
+            (Document(page_content=content, metadata=json.loads(metadata)), -score)
+            for content, metadata, score in rows
+        ]
+
+    def compact(self) -> bool:
+        with self._lock:
+            # Merge the index b-trees left fragmented by deletes
+            self._conn.execute(
+                "INSERT INTO lexical_fts (lexical_fts) VALUES ('optimize')"
+            )
+            self._conn.commit()
+            return vacuum_if_fragmented(self._conn)
@@ -1,11 +1,39 @@
+import asyncio
+import json
 import os
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from agent import process_prompt
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+import lazy
+from agent import (
+    in_flight_runs,
+    process_prompt,
+    response_cache,
+    single_flight_stats,
+    stream_prompt,
+    ui_output_stats,
+)
+from tools import image_generator, image_store, search_cache
+from rag_manager import MAX_RAG_K, rag_manager
 from upload import router as upload_router
 
-app = FastAPI(title="MultiFlex API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build clients in the background so the server accepts traffic right
+    # away; /ready reports when they are warm
+    warmup_task = None
+    if os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true":
+        warmup_task = asyncio.create_task(lazy.warm_up())
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+
+
+app = FastAPI(title="MultiFlex API", lifespan=lifespan)
 
 # Add CORS middleware
 # Configure CORS for both development and production
@@ -23,9 +51,22 @@ app.add_middleware(
 )
 
 
+# Public URL of this API, used to make image URLs absolute for the frontend,
+# which is served from another origin; defaults to the request's URL
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL")
+
+
+def public_base_url(request: Request) -> str:
+    return PUBLIC_API_URL or str(request.base_url)
+
+
 class PromptRequest(BaseModel):
     prompt: str
     user_id: str = "anonymous"
+    k: Optional[int] = Field(None, ge=1, le=MAX_RAG_K)  # chunks per RAG query
+    use_cache: bool = True  # set to False to bypass the response cache
+    # "fast" designs and implements the UI in one LLM call, None for PIPELINE_MODE
+    mode: Optional[Literal["quality", "fast"]] = None
 
 
 # Include upload router
@@ -37,16 +78,97 @@ async def root():
     return {"message": "MultiFlex API is running"}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once every client and model has been built."""
+    warm = lazy.all_initialized()
+    return JSONResponse(
+        {"status": "warm" if warm else "imported", "components": lazy.status()},
+        status_code=200 if warm else 503,
+    )
+
+
+@app.get("/api/stats")
+async def stats():
+    return {
+        "worker_pid": os.getpid(),
+        "embedding_cache": rag_manager.embedding_cache.stats(),
+        "query_embedding_cache": rag_manager.embeddings.query_cache_stats(),
+        "response_cache": response_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "ui_output": ui_output_stats,
+        "image_generation": image_generator.stats(),
+        "single_flight": {
+            **single_flight_stats,
+            "coalesced": in_flight_runs.joined,
+            "in_flight": len(in_flight_runs),
+        },
+    }
+
+
+@app.get("/api/images/{image_hash}")
+async def get_image(image_hash: str, request: Request):
+    """Serve a generated image; its content never changes, so cache it forever."""
+    found = image_store.find(image_hash)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    path, mime_type = found
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": f'"{image_hash}"',
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=mime_type, headers=headers)
+
+
 @app.post("/api/agent")
-async def agent_endpoint(request: PromptRequest):
+async def agent_endpoint(request: PromptRequest, http_request: Request):
     try:
-        result = await process_prompt(request.prompt, request.user_id)
-        return result
+        result = await process_prompt(
+            request.prompt,
+            request.user_id,
+            request.k,
+            request.use_cache,
+            request.mode,
+        )
+        return image_store.with_base_url(result, public_base_url(http_request))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/agent/stream")
+async def agent_stream_endpoint(request: PromptRequest, http_request: Request):
+    """Stream workflow progress and UI components as Server-Sent Events."""
+    base_url = public_base_url(http_request)
+
+    async def event_stream():
+        async for event in stream_prompt(
+            request.prompt,
+            request.user_id,
+            request.k,
+            request.use_cache,
+            request.mode,
+        ):
+            data = image_store.with_base_url(event["data"], base_url)
+            yield f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Several workers need the app as an import string so each can load it;
+    # they share the caches on disk and a Chroma server (see rag_manager)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
@@ -1,38 +1,71 @@
 import os
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
-from pathlib import Path
+import sqlite3
+import uuid
+import weakref
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.schema import Document
-from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_community.document_loaders import (
-    UnstructuredWordDocumentLoader,
-    UnstructuredPowerPointLoader,
-)
+from langchain_core.documents import Document
+
+from compaction import CompactionScheduler, vacuum_if_fragmented
+from corpus_versions import CorpusVersions
+from document_index import DocumentIndex
+from lexical_index import LexicalIndex, coverage, query_terms
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from lazy import Lazy
+from version_stamp import VersionStamp
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Most chunks a request may ask to retrieve per query; each one is graded and
+# fills the prompt, so the API rejects anything above this
+MAX_RAG_K = int(os.getenv("RAG_MAX_K", "20"))
+
 
 class RAGManager:
     """Simplified RAG manager using LangChain community components."""
 
     def __init__(self):
+        # Imported here to keep module import cheap, langchain_google_genai
+        # and the grader's prompt/parser stack take seconds to import
+        from langchain_google_genai import (
+            ChatGoogleGenerativeAI,
+            GoogleGenerativeAIEmbeddings,
+        )
+
+        from grading import RelevanceGrader
+
         # Initialize embeddings
 
         if not os.getenv("GOOGLE_API_KEY"):
             raise ValueError("GOOGLE_API_KEY environment variable is not set")
 
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
+        embedding_model = "models/embedding-001"
+
+        # Cache document embeddings so re-uploaded chunks are never re-embedded
+        self.embedding_cache = EmbeddingCache(
+            os.getenv("EMBEDDING_CACHE_PATH", "./cache_data/embeddings.db"),
+            max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000")),
+        )
+        self.embeddings = CachedEmbeddings(
+            GoogleGenerativeAIEmbeddings(
+                model=embedding_model,
+                google_api_key=os.getenv("GOOGLE_API_KEY"),
+            ),
+            self.embedding_cache,
+            model=embedding_model,
+            query_cache_size=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")),
+            query_task_type="RETRIEVAL_QUERY",
         )
 
         # Initialize LLM for routing and grading
@@ -40,96 +73,160 @@ class RAGManager:
             model="gemini-2.0-flash", google_api_key=os.getenv("GOOGLE_API_KEY")
         )
 
-        # Text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""],
+        # Persistent vectorstore, reloaded from disk at startup without re-embedding.
+        # With CHROMA_HOST set, all server workers share one Chroma server instead.
+        self.persist_directory = os.getenv("VECTORSTORE_DIR", "./vectorstore_data")
+        self.chroma_host = os.getenv("CHROMA_HOST")
+        self.chroma_port = int(os.getenv("CHROMA_PORT", "8000"))
+
+        # An on-disk Chroma index lives in the memory of one process and its
+        # writes are not coordinated with other processes
+        if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 and not self.chroma_host:
+            raise ValueError(
+                "Several server workers need a shared Chroma server, set CHROMA_HOST"
+            )
+        self.vectorstore = self._open_vectorstore()
+
+        # Bumped when the collection is recreated so other workers reopen it
+        self.vectorstore_stamp = VersionStamp(
+            os.getenv("VECTORSTORE_STAMP_PATH", "./cache_data/vectorstore.stamp")
+        )
+
+        # Per-user file metadata, so listing documents never scans the collection
+        self.document_index = DocumentIndex(
+            os.getenv("DOCUMENT_INDEX_PATH", "./cache_data/document_index.db")
+        )
+
+        # BM25 keyword index over the same chunks, fused with vector results
+        self.lexical_index = LexicalIndex(
+            os.getenv("LEXICAL_INDEX_PATH", "./cache_data/lexical_index.db")
+        )
+        self.hybrid_search = os.getenv("RAG_HYBRID_SEARCH", "true").lower() == "true"
+        self.lexical_fast_path = (
+            os.getenv("RAG_LEXICAL_FAST_PATH", "true").lower() == "true"
+        )
+        self._backfill_indexes()
+
+        # Updates of one file are planned against its stored chunk ids, so
+        # they must not interleave; a lock lives while an update holds it.
+        # These locks only hold within this process: with several workers, two
+        # uploads of the same file landing on different workers can still
+        # interleave and leave stale or missing chunks until it is re-uploaded.
+        self._file_locks = weakref.WeakValueDictionary()
+
+        # Reclaims disk space in the background once documents are deleted
+        self.compaction = CompactionScheduler(
+            self.compact, delay=float(os.getenv("COMPACTION_DELAY", "30"))
+        )
+
+        # Document-set versions, bumped whenever a user's documents change
+        self.corpus_versions = CorpusVersions(
+            os.getenv("CORPUS_VERSIONS_PATH", "./cache_data/corpus_versions.db")
         )
 
-        # TODO: In production, use persistent storage for vectorstore
-        # For now, create in-memory vectorstore that will be recreated on restart
-        self.vectorstore = None
-        self.retriever = None
+        # Default number of chunks retrieved per query
+        self.k = int(os.getenv("RAG_TOP_K", "3"))
 
         # Initialize retrieval grader
-        self.retrieval_grader_prompt = PromptTemplate(
-            template="""You are a grader assessing relevance of a retrieved document to a user question. 
-            If the document contains information related to the user question, grade it as relevant. 
-            The goal is to filter out erroneous retrievals.
-            
-            Give a binary score 'yes' or 'no' to indicate whether the document is relevant to the question.
-            Provide the binary score as a JSON with a single key 'score' and no preamble or explanation.
-            
-            Here is the retrieved document: {document}
-            Here is the user question: {question}""",
-            input_variables=["question", "document"],
+        self.grader = RelevanceGrader(
+            self.llm,
+            mode=os.getenv("RAG_GRADING_MODE", "batch"),
+            max_concurrency=int(os.getenv("RAG_GRADING_CONCURRENCY", "5")),
+            low_threshold=float(os.getenv("RAG_GRADING_LOW_THRESHOLD", "0.3")),
+            high_threshold=float(os.getenv("RAG_GRADING_HIGH_THRESHOLD", "0.75")),
         )
 
-        self.retrieval_grader = (
-            self.retrieval_grader_prompt | self.llm | JsonOutputParser()
+    def _open_vectorstore(self) -> "Chroma":
+        """Open (or create) the shared collection."""
+        import chromadb
+        from langchain_community.vectorstores import Chroma
+
+        if self.chroma_host:
+            return Chroma(
+                collection_name="educational_materials",
+                embedding_function=self.embeddings,
+                client=chromadb.HttpClient(
+                    host=self.chroma_host, port=self.chroma_port
+                ),
+            )
+
+        return Chroma(
+            collection_name="educational_materials",
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory,
         )
 
+    def _backfill_indexes(self, page_size: int = 5000):
+        """Index a collection that was populated before the indexes existed."""
+        build_documents = self.document_index.is_empty()
+        build_lexical = self.lexical_index.is_empty()
+        if not (build_documents or build_lexical):
+            return
+        total = self.vectorstore._collection.count()
+        if not total:
+            return
+
+        logger.info(f"Building document indexes from {total} stored chunks")
+        ids, metadatas = [], []
+        for offset in range(0, total, page_size):
+            page = self.vectorstore.get(
+                include=["metadatas", "documents"], limit=page_size, offset=offset
+            )
+            ids.extend(page["ids"])
+            metadatas.extend(page["metadatas"])
+            if build_lexical:
+                self.lexical_index.add(
+                    page["ids"],
+                    [
+                        Document(page_content=text, metadata=metadata)
+                        for text, metadata in zip(page["documents"], page["metadatas"])
+                    ],
+                )
+        if build_documents:
+            self.document_index.rebuild(ids, metadatas)
+
+    def _sync_vectorstore(self):
+        """Reopen the collection if another worker has recreated it."""
+        if self.vectorstore_stamp.changed():
+            logger.info("Vectorstore recreated by another worker, reopening")
+            self.vectorstore = self._open_vectorstore()
+
+    def _documents_changed(self, ids: List[str], documents: List[Document]):
+        """Index new chunks and invalidate cached results after a write."""
+        self.document_index.add_chunks(ids, [doc.metadata for doc in documents])
+        self.lexical_index.add(ids, documents)
+        self._bump_versions(documents)
+
     def load_document(
         self, file_path: str, filename: str, user_id: str
     ) -> List[Document]:
         """Load and process a single document."""
-        try:
-            file_ext = Path(filename).suffix.lower()
-
-            # Choose appropriate loader based on file type
-            if file_ext == ".pdf":
-                loader = PyPDFLoader(file_path)
-            elif file_ext == ".txt":
-                loader = TextLoader(file_path, encoding="utf-8")
-            elif file_ext == ".docx":
-                loader = UnstructuredWordDocumentLoader(file_path)
-            elif file_ext == ".pptx":
-                loader = UnstructuredPowerPointLoader(file_path)
-            else:
-                logger.error(f"Unsupported file type: {file_ext}")
-                return []
-
-            # Load documents
-            documents = loader.load()
-
-            # Add metadata
-            for doc in documents:
-                doc.metadata.update(
-                    {"user_id": user_id, "filename": filename, "file_type": file_ext}
-                )
+        import document_parser
 
-            # Split documents
-            doc_splits = self.text_splitter.split_documents(documents)
-
-            logger.info(f"Loaded {filename}: {len(doc_splits)} chunks created")
-            return doc_splits
+        try:
+            return document_parser.load_document(file_path, filename, user_id)
 
         except Exception as e:
             logger.error(f"Error loading document {filename}: {str(e)}")
             return []
 
+    def _bump_versions(self, documents: List[Document]):
+        """Bump the corpus version of every user whose documents changed."""
+        for user_id in {doc.metadata.get("user_id") for doc in documents}:
+            if user_id:
+                self.corpus_versions.bump(user_id)
+
     def add_documents_to_vectorstore(self, documents: List[Document]) -> bool:
         """Add documents to the vectorstore."""
         try:
             if not documents:
                 return False
 
-            if self.vectorstore is None:
-                # Create new vectorstore
-                self.vectorstore = Chroma.from_documents(
-                    documents=documents,
-                    embedding=self.embeddings,
-                    collection_name="educational_materials",
-                    persist_directory="./vectorstore_data",
-                )
-            else:
-                # Add to existing vectorstore
-                self.vectorstore.add_documents(documents)
-
-            # Update retriever
-            self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 3})
+            # Ids are recorded in the document index for targeted deletes
+            ids = [uuid.uuid4().hex for _ in documents]
+            self._sync_vectorstore()
+            self.vectorstore.add_documents(documents, ids=ids)
+            self._documents_changed(ids, documents)
 
             logger.info(f"Added {len(documents)} documents to vectorstore")
             return True
@@ -138,35 +235,259 @@ class RAGManager:
             logger.error(f"Error adding documents to vectorstore: {str(e)}")
             return False
 
+    def _search_kwargs(
+        self, user_id: Optional[str], k: Optional[int]
+    ) -> Dict[str, Any]:
+        """Build vector query arguments, pushing the user filter into the query."""
+        search_kwargs = {"k": k or self.k}
+        if user_id:
+            search_kwargs["filter"] = {"user_id": user_id}
+        return search_kwargs
+
+    def _lexical_search(
+        self, question: str, user_id: Optional[str], k: int
+    ) -> Tuple[List[Tuple[Document, Optional[float]]], bool]:
+        """Keyword hits, and whether they are strong enough to skip the vector search.
+
+        Hits are strong when the best one contains every keyword of the
+        question, e.g. a course code or formula name. Keyword hits have no
+        embedding similarity, so they are returned with None scores and are
+        always graded by the LLM.
+        """
+        if not self.hybrid_search:
+            return [], False
+
+        hits = self.lexical_index.search(question, user_id, k)
+        terms = query_terms(question)
+        if (
+            self.lexical_fast_path
+            and hits
+            and coverage(terms, hits[0][0].page_content) == 1.0
+        ):
+            return [(doc, None) for doc, _ in hits], True
+        return hits, False
+
+    @staticmethod
+    def _fuse(
+        vector_docs: List[Tuple[Document, float]],
+        lexical_docs: List[Tuple[Document, Optional[float]]],
+        k: int,
+        rrf_k: int = 60,
+    ) -> List[Tuple[Document, Optional[float]]]:
+        """Reciprocal-rank fusion of vector and keyword results.
+
+        Fused documents keep their embedding similarity, those found only by
+        keyword search get None.
+        """
+        fused: Dict[Tuple[Any, str], List[Any]] = {}
+        for results, is_vector in ((vector_docs, True), (lexical_docs, False)):
+            for rank, (doc, score) in enumerate(results):
+                key = (doc.metadata.get("filename"), doc.page_content)
+                entry = fused.setdefault(key, [doc, None, 0.0])
+                if is_vector:
+                    entry[1] = score
+                entry[2] += 1.0 / (rrf_k + rank + 1)
+
+        ranked = sorted(fused.values(), key=lambda entry: entry[2], reverse=True)
+        return [(doc, score) for doc, score, _ in ranked[:k]]
+
+    def search_documents(
+        self, question: str, user_id: Optional[str] = None, k: Optional[int] = None
+    ) -> List[Tuple[Document, Optional[float]]]:
+        """Top-k hybrid search results with their similarity, before grading."""
+        self._sync_vectorstore()
+        k = k or self.k
+
+        # Fuse keyword and vector candidates; keyword hits that cover the
+        # whole question are used alone, saving the query embedding call
+        lexical_docs, strong = self._lexical_search(question, user_id, 2 * k)
+        if strong:
+            return lexical_docs[:k]
+
+        # The user's documents along with their embedding similarity
+        vector_docs = self.vectorstore.similarity_search_with_relevance_scores(
+            question, **self._search_kwargs(user_id, 2 * k if lexical_docs else k)
+        )
+        return self._fuse(vector_docs, lexical_docs, k)
+
+    async def asearch_documents(
+        self, question: str, user_id: Optional[str] = None, k: Optional[int] = None
+    ) -> List[Tuple[Document, Optional[float]]]:
+        """Async version of search_documents()."""
+        self._sync_vectorstore()
+        k = k or self.k
+
+        lexical_docs, strong = self._lexical_search(question, user_id, 2 * k)
+        if strong:
+            return lexical_docs[:k]
+
+        vector_docs = await self.vectorstore.asimilarity_search_with_relevance_scores(
+            question, **self._search_kwargs(user_id, 2 * k if lexical_docs else k)
+        )
+        return self._fuse(vector_docs, lexical_docs, k)
+
+    async def aprefetch_query_embeddings(
+        self, questions: List[str], user_id: Optional[str] = None
+    ):
+        """Embed several upcoming search queries in one batched call.
+
+        The searches then find their vectors in the query cache. Queries the
+        keyword fast path will answer are skipped.
+        """
+        questions = [
+            question
+            for question in dict.fromkeys(questions)
+            if not self._lexical_search(question, user_id, self.k)[1]
+        ]
+        if len(questions) < 2:
+            return
+        try:
+            await self.embeddings.aembed_queries(questions)
+        except Exception as e:
+            # Each search embeds its own query instead
+            logger.warning(f"Batched query embedding failed: {str(e)}")
+
     def retrieve_documents(
-        self, question: str, user_id: Optional[str] = None
+        self, question: str, user_id: Optional[str] = None, k: Optional[int] = None
     ) -> List[Document]:
         """Retrieve relevant documents for the question."""
         try:
-            if self.retriever is None:
-                return []
+            scored_docs = self.search_documents(question, user_id, k)
 
-            # Retrieve documents
-            docs = self.retriever.invoke(question)
+            # Grade retrieved documents for relevance
+            relevant_docs = self.grader.grade(question, scored_docs)
 
-            # Filter by user_id if provided
-            if user_id:
-                docs = [doc for doc in docs if doc.metadata.get("user_id") == user_id]
+            logger.info(f"Retrieved {len(relevant_docs)} relevant documents")
+            return relevant_docs
 
-            # Grade retrieved documents for relevance
-            relevant_docs = []
+        except Exception as e:
+            logger.error(f"Error retrieving documents: {str(e)}")
+            return []
+
+    @staticmethod
+    def chunk_id(user_id: str, filename: str, content: str, occurrence: int) -> str:
+        """Content-addressed id, stable across uploads of the same file."""
+        key = f"{user_id}\0{filename}\0{occurrence}\0{content}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _file_lock(self, key: Tuple[str, str]) -> asyncio.Lock:
+        lock = self._file_locks.get(key)
+        if lock is None:
+            lock = self._file_locks[key] = asyncio.Lock()
+        return lock
+
+    def _plan_file_update(self, documents: List[Document]) -> Dict[str, Any]:
+        """Diff the chunks of uploaded files against their stored versions."""
+        files: Dict[Tuple[str, str], List[Document]] = defaultdict(list)
+        for doc in documents:
+            files[(doc.metadata["user_id"], doc.metadata["filename"])].append(doc)
+
+        plan = {"ids": [], "new": {}, "kept": {}, "removed": [], "counts": {}}
+        for (user_id, filename), docs in files.items():
+            # Identical chunks within a file are told apart by occurrence
+            seen = defaultdict(int)
+            ids = []
             for doc in docs:
-                try:
-                    grade = self.retrieval_grader.invoke(
-                        {"question": question, "document": doc.page_content}
+                ids.append(
+                    self.chunk_id(
+                        user_id, filename, doc.page_content, seen[doc.page_content]
                     )
+                )
+                seen[doc.page_content] += 1
+
+            old_ids = set(self.document_index.chunk_ids(user_id, filename))
+            removed = old_ids.difference(ids)
+            added = 0
+            for chunk_id, doc in zip(ids, docs):
+                if chunk_id in old_ids:
+                    plan["kept"][chunk_id] = doc
+                else:
+                    plan["new"][chunk_id] = doc
+                    added += 1
+            plan["ids"].extend(ids)
+            plan["removed"].extend(removed)
+            plan["counts"][(user_id, filename)] = {
+                "chunks_added": added,
+                "chunks_unchanged": len(ids) - added,
+                "chunks_removed": len(removed),
+            }
+        return plan
+
+    def _apply_file_update(self, plan: Dict[str, Any], documents: List[Document]):
+        """Store everything but the new vectors, which the caller has added."""
+        if plan["removed"]:
+            self.vectorstore.delete(ids=plan["removed"])
+            self.lexical_index.delete(plan["removed"])
+        if plan["kept"]:
+            # Unchanged text keeps its vector, only the metadata is refreshed
+            self.vectorstore._collection.update(
+                ids=list(plan["kept"]),
+                metadatas=[doc.metadata for doc in plan["kept"].values()],
+            )
+
+        self.document_index.replace_files(
+            plan["ids"], [doc.metadata for doc in documents]
+        )
+        # Re-indexing unchanged chunks locally is cheap and refreshes their metadata
+        self.lexical_index.add(
+            list(plan["new"]) + list(plan["kept"]),
+            list(plan["new"].values()) + list(plan["kept"].values()),
+        )
+        if plan["new"] or plan["removed"]:
+            self._bump_versions(documents)
+
+    async def aupdate_file_documents(
+        self, documents: List[Document]
+    ) -> Optional[Dict[Tuple[str, str], Dict[str, int]]]:
+        """Store new versions of files, embedding only chunks that changed.
+
+        Every (user_id, filename) in the documents replaces its previous
+        version, so the documents must hold one version of each file. Updates
+        of the same file are serialized within this worker process only.
+        Returns the added/unchanged/removed chunk counts per file, or None on
+        failure.
+        """
+        try:
+            if not documents:
+                return {}
+
+            files = sorted(
+                {
+                    (doc.metadata["user_id"], doc.metadata["filename"])
+                    for doc in documents
+                }
+            )
+            async with AsyncExitStack() as stack:
+                # Acquired in sorted order, so batches sharing files cannot deadlock
+                for key in files:
+                    await stack.enter_async_context(self._file_lock(key))
+
+                self._sync_vectorstore()
+                plan = self._plan_file_update(documents)
+                if plan["new"]:
+                    await self.vectorstore.aadd_documents(
+                        list(plan["new"].values()), ids=list(plan["new"])
+                    )
+                self._apply_file_update(plan, documents)
 
-                    if grade.get("score") == "yes":
-                        relevant_docs.append(doc)
-                except Exception as e:
-                    logger.warning(f"Error grading document: {str(e)}")
-                    # Include document if grading fails
-                    relevant_docs.append(doc)
+            logger.info(
+                f"Updated {len(plan['counts'])} files: {len(plan['new'])} chunks embedded, "
+                f"{len(plan['kept'])} unchanged, {len(plan['removed'])} removed"
+            )
+            return plan["counts"]
+
+        except Exception as e:
+            logger.error(f"Error updating documents in vectorstore: {str(e)}")
+            return None
+
+    async def aretrieve_documents(
+        self, question: str, user_id: Optional[str] = None, k: Optional[int] = None
+    ) -> List[Document]:
+        """Async version of retrieve_documents()."""
+        try:
+            scored_docs = await self.asearch_documents(question, user_id, k)
+
+            relevant_docs = await self.grader.agrade(question, scored_docs)
 
             logger.info(f"Retrieved {len(relevant_docs)} relevant documents")
             return relevant_docs
@@ -188,42 +509,81 @@ class RAGManager:
 
         return "\n\n".join(formatted_docs)
 
-    def get_user_documents_info(self, user_id: str) -> Dict[str, Any]:
-        """Get information about user's documents."""
+    def get_user_documents_info(
+        self, user_id: str, limit: Optional[int] = None, offset: int = 0
+    ) -> Dict[str, Any]:
+        """Get information about user's documents, with the file list paginated."""
         try:
-            if self.vectorstore is None:
-                return {"total_documents": 0, "files": []}
-
-            # Get all documents for user (this is a simplified approach)
-            # TODO: In production, store document metadata separately for efficient querying
-            all_docs = self.vectorstore.get()
-
-            user_docs = []
-            files = set()
-
-            for i, metadata in enumerate(all_docs.get("metadatas", [])):
-                if metadata.get("user_id") == user_id:
-                    user_docs.append(metadata)
-                    files.add(metadata.get("filename", "Unknown"))
+            totals = self.document_index.user_totals(user_id)
+            files = self.document_index.list_files(user_id, limit, offset)
 
             return {
-                "total_documents": len(user_docs),
-                "total_chunks": len(user_docs),
-                "files": list(files),
-                "file_count": len(files),
+                "total_documents": totals["total_chunks"],
+                "total_chunks": totals["total_chunks"],
+                "total_bytes": totals["total_bytes"],
+                "files": [file["filename"] for file in files],
+                "file_details": files,
+                "file_count": totals["file_count"],
+                "limit": limit,
+                "offset": offset,
             }
 
         except Exception as e:
             logger.error(f"Error getting user documents: {str(e)}")
             return {"error": str(e)}
 
+    def delete_documents(
+        self, user_id: str, filename: Optional[str] = None, batch_size: int = 5000
+    ) -> Dict[str, int]:
+        """Delete all of a user's documents, or a single file, by chunk id."""
+        ids = self.document_index.chunk_ids(user_id, filename)
+        if ids:
+            self._sync_vectorstore()
+            for start in range(0, len(ids), batch_size):
+                self.vectorstore.delete(ids=ids[start : start + batch_size])
+            self.lexical_index.delete(ids)
+
+        files_deleted = self.document_index.remove(user_id, filename)
+        if ids or files_deleted:
+            # Cached responses and retrievals for this user are now stale
+            self.corpus_versions.bump(user_id)
+            self.compaction.schedule()
+
+        target = f"{filename} of user {user_id}" if filename else f"user {user_id}"
+        logger.info(f"Deleted {len(ids)} chunks of {target}")
+        return {"files_deleted": files_deleted, "chunks_deleted": len(ids)}
+
+    def compact(self):
+        """Reclaim the space left behind by deleted documents."""
+        self.document_index.compact()
+        self.lexical_index.compact()
+        self.embedding_cache.compact()
+
+        # Chroma stores records and its write-ahead log in SQLite as well
+        chroma_db = os.path.join(self.persist_directory, "chroma.sqlite3")
+        if self.chroma_host or not os.path.exists(chroma_db):
+            return
+        try:
+            conn = sqlite3.connect(chroma_db, timeout=30)
+            try:
+                vacuum_if_fragmented(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Busy with writes; the next compaction will try again
+            logger.warning(f"Could not compact vectorstore: {e}")
+
     def clear_vectorstore(self):
         """Clear the vectorstore (for development purposes)."""
-        # TODO: In production, implement proper document deletion by user_id
-        self.vectorstore = None
-        self.retriever = None
+        self._sync_vectorstore()
+        self.vectorstore.delete_collection()
+        self.vectorstore = self._open_vectorstore()
+        self.document_index.clear()
+        self.lexical_index.clear()
+        self.vectorstore_stamp.bump()
+        self.corpus_versions.bump_all()
         logger.info("Vectorstore cleared")
 
 
-# Global instance
-rag_manager = RAGManager()
+# Global instance, built on first use
+rag_manager: RAGManager = Lazy("rag_manager", RAGManager)
@@ -0,0 +1,137 @@
+"""Result cache for generated UIs."""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize case, whitespace and trailing punctuation of a prompt."""
+    return re.sub(r"\s+", " ", prompt).strip().rstrip("?!. ").lower()
+
+
+class ResponseCache:
+    """TTL + LRU cache of process_prompt results with an optional SQLite backend.
+
+    The in-memory LRU is always used; when a path is given, entries are also
+    written to disk so they survive restarts.
+    """
+
+    def __init__(
+        self, max_entries: int = 256, ttl: float = 3600, path: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )"""
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        prompt: str, user_id: str, corpus_version: str, settings: Dict[str, Any]
+    ) -> str:
+        # Per user: UIs are built from the user's own documents, and corpus
+        # versions are counters that other users share values with
+        payload = json.dumps(
+            {
+                "prompt": normalize_prompt(prompt),
+                "user_id": user_id,
+                "corpus_version": corpus_version,
+                "settings": settings,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = (row[1], json.loads(row[0]))
+                    self._entries[key] = entry
+                    self._evict()
+
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    self._delete(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Dict[str, Any]):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            self._evict()
+
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+                # Keep the disk backend bounded as well
+                self._conn.execute(
+                    "DELETE FROM responses WHERE expires_at < ?", (time.time(),)
+                )
+                self._conn.execute(
+                    """DELETE FROM responses WHERE key NOT IN (
+                        SELECT key FROM responses ORDER BY expires_at DESC LIMIT ?
+                    )""",
+                    (self.max_entries,),
+                )
+                self._conn.commit()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _delete(self, key: str):
+        self._entries.pop(key, None)
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "persistent": self._conn is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,137 @@
+"""Cached, rate-limited web and image search."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, List
+
+from response_cache import ResponseCache, normalize_prompt
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether a search failed because the upstream rate limit was hit."""
+    message = str(error).lower()
+    return (
+        "ratelimit" in type(error).__name__.lower()
+        or "ratelimit" in message
+        or "429" in message
+    )
+
+
+class TokenBucket:
+    """Asyncio token bucket allowing `rate` calls per second, bursting to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Take a token, waiting for one if needed; returns the seconds waited."""
+        async with self._lock:
+            self._refill()
+            waited = 0.0
+            if self._tokens < 1:
+                waited = (1 - self._tokens) / self.rate
+                await asyncio.sleep(waited)
+                self._refill()
+            self._tokens -= 1
+            return waited
+
+
+class SearchCache:
+    """Search results cached by (backend, query, max_results).
+
+    Concurrent identical searches share one upstream call, upstream calls are
+    paced by a token bucket, and rate-limit errors are retried with jittered
+    exponential backoff. Failures and empty results are not cached, an empty
+    result is often a transient upstream hiccup rather than a real answer.
+    """
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        limiter: TokenBucket,
+        max_retries: int = 2,
+        retry_delay: float = 1.0,
+    ):
+        self.cache = cache
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.metrics = {
+            "upstream_calls": 0,
+            "throttled": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "failures": 0,
+            "empty": 0,
+        }
+        self._in_flight = SingleFlight()
+
+    @staticmethod
+    def make_key(backend: str, query: str, max_results: int) -> str:
+        payload = json.dumps([backend, normalize_prompt(query), max_results])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def search(self, tool, query: str) -> List[Dict[str, Any]]:
+        """Run a DuckDuckGo search tool through the cache."""
+        key = self.make_key(tool.backend, query, tool.max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        return await self._in_flight.run(key, lambda: self._fetch(tool, query, key))
+
+    async def _fetch(self, tool, query: str, key: str) -> List[Dict[str, Any]]:
+        results = await self._fetch_with_retries(tool, query)
+        if not results:
+            self.metrics["empty"] += 1
+            return results
+        # Stored here so the result is kept even if every waiter went away
+        self.cache.set(key, results)
+        return results
+
+    async def _fetch_with_retries(self, tool, query: str) -> List[Dict[str, Any]]:
+        for attempt in range(self.max_retries + 1):
+            if await self.limiter.acquire() > 0:
+                self.metrics["throttled"] += 1
+            self.metrics["upstream_calls"] += 1
+            try:
+                # DuckDuckGo only has a sync client, ainvoke runs it in an executor
+                return await tool.ainvoke(query)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    self.metrics["failures"] += 1
+                    raise
+                self.metrics["rate_limited"] += 1
+                if attempt == self.max_retries:
+                    self.metrics["failures"] += 1
+                    raise
+
+                delay = self.retry_delay * 2**attempt * random.uniform(0.5, 1.5)
+                self.metrics["retries"] += 1
+                logger.info(f"Search rate limited, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            **self.metrics,
+            "coalesced": self._in_flight.joined,
+        }
@@ -0,0 +1,40 @@
+"""Sharing one run of an async call between concurrent callers."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class SingleFlight:
+    """In-flight tasks by key, so identical concurrent calls run once.
+
+    Callers await the shared task through asyncio.shield, so a caller being
+    cancelled (e.g. a client disconnecting) does not cancel the run for the
+    others. A task is dropped as soon as it finishes; callers that need its
+    result afterwards cache it inside the task.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.joined = 0
+
+    def get(self, key: str) -> Optional[asyncio.Task]:
+        return self._tasks.get(key)
+
+    def start(self, key: str, run: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """The in-flight task for key, starting run() if there is none."""
+        task = self._tasks.get(key)
+        if task is not None:
+            self.joined += 1
+            return task
+
+        task = asyncio.ensure_future(run())
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return task
+
+    async def run(self, key: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of the in-flight run for key, starting one if needed."""
+        return await asyncio.shield(self.start(key, run))
+
+    def __len__(self) -> int:
+        return len(self._tasks)
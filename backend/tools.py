@@ -1,101 +1,156 @@
 import os
-from typing import Dict, List, Any
+from typing import Annotated, Dict, List, Any, Optional
 import logging
-from langchain_community.tools import DuckDuckGoSearchResults
-from langchain_core.tools import tool
-from langchain.schema import Document
+from langchain_core.tools import InjectedToolArg, tool
+from langchain_core.documents import Document
+from image_generation import ImageGenerator
+from image_store import ImageStore
+from lazy import Lazy
 from rag_manager import rag_manager
-from google.genai import types
-from google import genai
+from response_cache import ResponseCache
+from search_cache import SearchCache, TokenBucket
 
-# Initialize search tools
-search_tool = DuckDuckGoSearchResults(output_format="list", max_results=5)
-image_search_tool = DuckDuckGoSearchResults(
-    output_format="list", backend="images", max_results=8
+
+def create_search_tool(**kwargs):
+    from langchain_community.tools import DuckDuckGoSearchResults
+
+    return DuckDuckGoSearchResults(output_format="list", **kwargs)
+
+
+def create_genai_client():
+    from google import genai
+
+    return genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+# Initialize search tools, built on first use
+search_tool = Lazy("search_tool", lambda: create_search_tool(max_results=5))
+image_search_tool = Lazy(
+    "image_search_tool",
+    lambda: create_search_tool(backend="images", max_results=8),
+)
+
+# Search results shared by all server workers, with upstream calls paced to
+# stay under DuckDuckGo's rate limit (the rate is split between workers)
+search_cache = SearchCache(
+    ResponseCache(
+        max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048")),
+        ttl=float(os.getenv("SEARCH_CACHE_TTL", "86400")),
+        path=os.getenv("SEARCH_CACHE_PATH", "./cache_data/search_cache.db") or None,
+    ),
+    TokenBucket(
+        rate=float(os.getenv("SEARCH_RATE_LIMIT", "1.0"))
+        / int(os.getenv("WEB_CONCURRENCY", "1")),
+        capacity=float(os.getenv("SEARCH_BURST", "3")),
+    ),
+    max_retries=int(os.getenv("SEARCH_MAX_RETRIES", "2")),
 )
 
-# Initialize Imagen client
-genai_client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+# Initialize Imagen client, built on first use
+genai_client = Lazy("genai_client", create_genai_client)
+
+# Generated images, served by GET /api/images/{hash} instead of inlined in UIs
+image_store = ImageStore(os.getenv("IMAGE_STORE_DIR", "./cache_data/images"))
+
+IMAGE_GENERATION = os.getenv("IMAGE_GENERATION", "true").lower() == "true"
+IMAGEN_MODEL = os.getenv("IMAGEN_MODEL", "imagen-3.0-generate-002")
 
 
 # Research tools
 @tool(description="Search the web for information.")
-def web_search_tool_fn(query: str) -> List[Dict[str, Any]]:
+async def web_search_tool_fn(query: str) -> List[Dict[str, Any]]:
     """Search the web for information."""
     try:
-        return search_tool.invoke(query)
+        return await search_cache.search(search_tool, query)
     except Exception as e:
         logging.warning(f"Web search failed (likely rate limited): {e}")
         return []  # Return empty list so agent can continue without search results
 
 
 @tool(description="Search for images related to the query.")
-def image_search_tool_fn(query: str) -> List[Dict[str, Any]]:
+async def image_search_tool_fn(query: str) -> List[Dict[str, Any]]:
     """Search for images related to the query."""
     try:
-        return image_search_tool.invoke(query)
+        return await search_cache.search(image_search_tool, query)
     except Exception as e:
         logging.warning(f"Image search failed (likely rate limited): {e}")
         return []  # Return empty list so agent can continue without image results
 
 
 @tool(description="Retrieve relevant documents from the user's uploaded materials.")
-def rag_search_tool_fn(query: str, user_id: str = "anonymous") -> List[Document]:
+async def rag_search_tool_fn(
+    query: str,
+    user_id: Annotated[str, InjectedToolArg] = "anonymous",
+    k: Annotated[Optional[int], InjectedToolArg] = None,
+) -> List[Document]:
     """Retrieve relevant documents from the user's uploaded materials."""
-    return rag_manager.retrieve_documents(query, user_id)
+    # user_id and k are injected by the graph from the request, not chosen by the LLM
+    return await rag_manager.aretrieve_documents(query, user_id, k)
 
 
 # UI agent tools
 @tool(description="Search for UI inspiration images.")
-def ui_image_search_tool_fn(query: str) -> List[Dict[str, Any]]:
+async def ui_image_search_tool_fn(query: str) -> List[Dict[str, Any]]:
     """Search for UI inspiration images to enhance UI design."""
     try:
-        return image_search_tool.invoke(query)
+        return await search_cache.search(image_search_tool, query)
     except Exception as e:
         logging.warning(f"UI image search failed (likely rate limited): {e}")
         return []  # Return empty list so agent can continue without UI images
 
 
+async def generate_image(prompt: str) -> bytes:
+    """Generate one JPEG image with Google Imagen."""
+    from google.genai import types
+
+    logging.info(f"Generating image with Imagen: {prompt}")
+    response = await genai_client.aio.models.generate_images(
+        model=IMAGEN_MODEL,
+        prompt=prompt,
+        config=types.GenerateImagesConfig(
+            number_of_images=1,
+            include_rai_reason=True,
+            output_mime_type="image/jpeg",
+        ),
+    )
+    if not response.generated_images:
+        raise ValueError("Imagen returned no image")
+    return response.generated_images[0].image.image_bytes
+
+
+# Images are generated in the background, a bounded number at a time, and
+# cached on disk by prompt
+image_generator = ImageGenerator(
+    generate_image,
+    image_store,
+    ResponseCache(
+        max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "1024")),
+        ttl=float(os.getenv("IMAGE_CACHE_TTL", str(30 * 86400))),
+        path=os.getenv("IMAGE_CACHE_PATH", "./cache_data/image_cache.db") or None,
+    ),
+    concurrency=int(os.getenv("IMAGEN_CONCURRENCY", "2")),
+    model=IMAGEN_MODEL,
+)
+
+
 @tool(
-    description="Generate an image using Google Imagen. Limited to 1 image per request."
+    description="Generate a custom image using Google Imagen. Returns a handle to reference the image with; the image is added to the UI when ready."
 )
-def imagen_generate_tool_fn(prompt: str) -> str:
-    """Generate an image using Google Imagen. Limited to 1 image per request.
+async def imagen_generate_tool_fn(prompt: str) -> str:
+    """Start generating an image using Google Imagen.
 
     Args:
         prompt: A detailed description of the image to generate
 
     Returns:
-        Base64 encoded image data or error message
+        A short handle for the image, never the image itself
     """
-    try:
-        logging.info(f"Generating image with Imagen: {prompt}")
-
-        response = genai_client.models.generate_images(
-            model="imagen-3.0-generate-002",
-            prompt=prompt,
-            config=types.GenerateImagesConfig(
-                number_of_images=1,
-                include_rai_reason=True,
-                output_mime_type="image/jpeg",
-            ),
-        )
-
-        # Get the generated image
-        generated_image = response.generated_images[0].image
-
-        img_data_url = f"data:image/jpeg;base64,{generated_image.image_bytes}"
-
-        logging.info("Image generated successfully")
-        return img_data_url
-
-    except Exception as e:
-        logging.error(f"Error generating image with Imagen: {e}")
-        return f"Error generating image: {str(e)}"
+    handle = image_generator.submit(prompt)
+    return f"Image generation started, reference it as [GENERATED_IMAGE:{handle}]"
 
 
 # Tool lists for different agents
 research_tools = [web_search_tool_fn, image_search_tool_fn, rag_search_tool_fn]
-ui_tools = [
-    ui_image_search_tool_fn
-]  # Removed imagen_generate_tool_fn to prevent token overflow
+ui_tools = [ui_image_search_tool_fn]
+if IMAGE_GENERATION:
+    ui_tools.append(imagen_generate_tool_fn)
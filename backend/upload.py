@@ -1,15 +1,18 @@
 """File upload endpoints for educational materials."""
 
+import asyncio
 import os
 import tempfile
 import logging
-from typing import List
+from typing import List, Optional
 from pathlib import Path
 
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
+import aiofiles
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Query
 from fastapi.responses import JSONResponse
 
-from rag_manager import rag_manager
+from ingestion import ingestion_queue
+from rag_manager import MAX_RAG_K, rag_manager
 
 logger = logging.getLogger(__name__)
 
@@ -17,19 +20,49 @@ router = APIRouter()
 
 # Supported file types
 SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".pptx", ".txt"}
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", str(10 * 1024 * 1024)))  # 10MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+async def save_upload(file: UploadFile, suffix: str) -> Optional[str]:
+    """Stream an upload to a temporary file in fixed-size chunks.
+
+    Returns the file path, or None if the upload exceeds MAX_FILE_SIZE. Only one
+    chunk is held in memory at a time.
+    """
+    # Reject early when the client declared the size
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        return None
+
+    fd, tmp_file_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+
+    size = 0
+    try:
+        async with aiofiles.open(tmp_file_path, "wb") as tmp_file:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    os.unlink(tmp_file_path)
+                    return None
+                await tmp_file.write(chunk)
+    except Exception:
+        os.unlink(tmp_file_path)
+        raise
+
+    return tmp_file_path
 
 
 @router.post("/upload")
 async def upload_documents(
     files: List[UploadFile] = File(...), user_id: str = Form(...)
 ):
-    """Upload and process educational documents."""
+    """Upload educational documents and queue them for background processing."""
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID is required")
 
     results = []
-    all_documents = []
+    queued_files = []
 
     for file in files:
         try:
@@ -55,9 +88,9 @@ async def upload_documents(
                 )
                 continue
 
-            # Check file size
-            file_content = await file.read()
-            if len(file_content) > MAX_FILE_SIZE:
+            # Stream to a temporary file, the ingestion job deletes it when done
+            tmp_file_path = await save_upload(file, file_ext)
+            if tmp_file_path is None:
                 results.append(
                     {
                         "filename": file.filename,
@@ -67,77 +100,62 @@ async def upload_documents(
                 )
                 continue
 
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-                tmp_file.write(file_content)
-                tmp_file_path = tmp_file.name
-
-            try:
-                # Process document using simplified RAG manager
-                documents = rag_manager.load_document(
-                    file_path=tmp_file_path, filename=file.filename, user_id=user_id
-                )
-
-                if not documents:
-                    results.append(
-                        {
-                            "filename": file.filename,
-                            "status": "error",
-                            "message": "Failed to extract text from document",
-                        }
-                    )
-                    continue
-
-                # Collect documents to add to vectorstore
-                all_documents.extend(documents)
+            queued_files.append((file.filename, tmp_file_path))
 
-                results.append(
-                    {
-                        "filename": file.filename,
-                        "status": "success",
-                        "message": f"Processed into {len(documents)} chunks",
-                        "chunks_created": len(documents),
-                    }
-                )
-
-            finally:
-                # Clean up temporary file
-                os.unlink(tmp_file_path)
+            results.append(
+                {
+                    "filename": file.filename,
+                    "status": "queued",
+                    "message": "Queued for processing",
+                }
+            )
 
         except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {str(e)}")
+            logger.error(f"Error receiving file {file.filename}: {str(e)}")
             results.append(
                 {
                     "filename": file.filename,
                     "status": "error",
-                    "message": f"Processing failed: {str(e)}",
+                    "message": f"Upload failed: {str(e)}",
                 }
             )
 
-    # Add all documents to vectorstore at once
-    if all_documents:
-        success = rag_manager.add_documents_to_vectorstore(all_documents)
-        if not success:
-            logger.error("Failed to add documents to vectorstore")
-
-    # Count successful uploads
-    successful = sum(1 for r in results if r["status"] == "success")
+    # Parse and embed in the background
+    job_id = None
+    if queued_files:
+        job_id = ingestion_queue.submit(user_id, queued_files).id
 
     return JSONResponse(
         {
-            "message": f"Processed {successful}/{len(files)} files successfully",
+            "message": f"Queued {len(queued_files)}/{len(files)} files for processing",
+            "job_id": job_id,
+            "status_url": f"/api/upload/jobs/{job_id}" if job_id else None,
             "results": results,
             "user_id": user_id,
-            "total_chunks": len(all_documents),
-        }
+        },
+        status_code=202 if job_id else 200,
     )
 
 
+@router.get("/upload/jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    """Get per-file progress of an ingestion job."""
+    job = ingestion_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+
+    return JSONResponse(job)
+
+
 @router.get("/documents/{user_id}")
-async def get_user_documents(user_id: str):
-    """Get all documents for a user."""
+async def get_user_documents(
+    user_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    """Get all documents for a user, optionally one page of files at a time."""
     try:
-        doc_info = rag_manager.get_user_documents_info(user_id)
+        doc_info = rag_manager.get_user_documents_info(user_id, limit, offset)
 
         return JSONResponse({"user_id": user_id, "statistics": doc_info})
 
@@ -148,12 +166,17 @@ async def get_user_documents(user_id: str):
 
 @router.delete("/documents/{user_id}")
 async def delete_user_documents(user_id: str):
-    """Delete all documents (for development - clears entire vectorstore)."""
+    """Delete all documents of a user."""
     try:
-        rag_manager.clear_vectorstore()
+        result = await asyncio.to_thread(rag_manager.delete_documents, user_id)
 
         return JSONResponse(
-            {"message": f"Cleared vectorstore (development mode)", "user_id": user_id}
+            {
+                "message": f"Deleted {result['files_deleted']} files "
+                f"({result['chunks_deleted']} chunks)",
+                "user_id": user_id,
+                **result,
+            }
         )
 
     except Exception as e:
@@ -161,8 +184,38 @@ async def delete_user_documents(user_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.delete("/documents/{user_id}/{filename}")
+async def delete_user_document(user_id: str, filename: str):
+    """Delete a single file of a user."""
+    try:
+        result = await asyncio.to_thread(
+            rag_manager.delete_documents, user_id, filename
+        )
+        if not result["files_deleted"]:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        return JSONResponse(
+            {
+                "message": f"Deleted {filename} ({result['chunks_deleted']} chunks)",
+                "user_id": user_id,
+                "filename": filename,
+                **result,
+            }
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting document {filename}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/test-rag")
-async def test_rag_retrieval(query: str = Form(...), user_id: str = Form(...)):
+async def test_rag_retrieval(
+    query: str = Form(...),
+    user_id: str = Form(...),
+    k: Optional[int] = Form(None, ge=1, le=MAX_RAG_K),
+):
     """Test RAG retrieval for a query."""
     try:
         # Check if RAG should be used
@@ -173,7 +226,7 @@ async def test_rag_retrieval(query: str = Form(...), user_id: str = Form(...)):
 
         if rag_decision["use_rag"]:
             # Retrieve relevant documents
-            documents = rag_manager.retrieve_documents(query, user_id)
+            documents = await rag_manager.aretrieve_documents(query, user_id, k)
             context = rag_manager.format_docs(documents)
 
         return JSONResponse(
@@ -202,13 +255,15 @@ async def get_vectorstore_info():
 
         info = {
             "has_vectorstore": has_vectorstore,
-            "retriever_available": rag_manager.retriever is not None,
+            "retriever_available": has_vectorstore,
         }
 
         if has_vectorstore:
             try:
-                collection_info = rag_manager.vectorstore.get()
-                info["total_documents"] = len(collection_info.get("ids", []))
+                totals = rag_manager.document_index.totals()
+                info["total_documents"] = totals["chunks"]
+                info["total_files"] = totals["files"]
+                info["total_users"] = totals["users"]
             except:
                 info["total_documents"] = "unknown"
 
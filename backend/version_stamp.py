@@ -0,0 +1,51 @@
+"""File-based change notification between server worker processes."""
+
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+class VersionStamp:
+    """A small file that is replaced every time shared state changes.
+
+    Writers call bump() after changing the shared state; readers call
+    changed() before using their local view of it. Checking costs a single
+    stat() call, so it can run on every request.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(path):
+            self.bump()
+        self._seen = self._stat()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # os.replace() gives the file a new inode even within one mtime tick
+        return stat.st_ino, stat.st_mtime_ns
+
+    def bump(self):
+        """Signal a change to every other process watching the stamp."""
+        with self._lock:
+            tmp_path = f"{self.path}.{uuid.uuid4().hex}"
+            with open(tmp_path, "w") as f:
+                f.write(uuid.uuid4().hex)
+            os.replace(tmp_path, self.path)
+            # Our own change is already reflected locally
+            self._seen = self._stat()
+
+    def changed(self) -> bool:
+        """Whether another process bumped the stamp since the last check."""
+        current = self._stat()
+        with self._lock:
+            if current == self._seen:
+                return False
+            self._seen = current
+            return True
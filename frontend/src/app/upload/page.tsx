@@ -4,6 +4,13 @@ import { useState } from "react";
 import { useRouter } from "next/navigation";
 import { API_ENDPOINTS } from "../../lib/api";
 
+const JOB_POLL_INTERVAL = 1000;
+
+const FILE_STATUS_STYLES: Record<string, string> = {
+  done: "bg-green-100 text-green-800",
+  error: "bg-red-100 text-red-800",
+};
+
 export default function Upload() {
   const [files, setFiles] = useState<FileList | null>(null);
   const [userId, setUserId] = useState("demo-user");
@@ -35,6 +42,9 @@ export default function Upload() {
 
       const result = await response.json();
       setResults(result);
+      if (result.job_id) {
+        await pollJob(result);
+      }
     } catch (error) {
       console.error("Upload error:", error);
       setResults({ error: "Upload failed" });
@@ -43,6 +53,33 @@ export default function Upload() {
     }
   };
 
+  // Files are parsed and embedded in the background, follow the job until done
+  const pollJob = async (upload: any) => {
+    const rejected = upload.results.filter((r: any) => r.status === "error");
+
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL));
+
+      const response = await fetch(API_ENDPOINTS.uploadJob(upload.job_id));
+      if (!response.ok) {
+        setResults({ ...upload, error: "Lost track of the upload job" });
+        return;
+      }
+
+      const job = await response.json();
+      const finished = job.status === "completed" || job.status === "failed";
+      setResults({
+        ...upload,
+        message: finished
+          ? `Processed ${job.files_done}/${upload.results.length} files successfully`
+          : `Processing ${job.files_done}/${job.total_files} files...`,
+        results: [...job.files, ...rejected],
+        total_chunks: job.total_chunks,
+      });
+      if (finished) return;
+    }
+  };
+
   const supportedTypes = [".pdf", ".docx", ".pptx", ".txt"];
 
   return (
@@ -179,7 +216,7 @@ export default function Upload() {
                       d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"
                     ></path>
                   </svg>
-                  Uploading...
+                  {results?.job_id ? "Processing..." : "Uploading..."}
                 </span>
               ) : (
                 "📚 Upload Documents"
@@ -197,18 +234,19 @@ export default function Upload() {
                 ) : (
                   <div className="space-y-2">
                     <p className="text-green-600">{results.message}</p>
-                    <p className="text-sm text-gray-600">
-                      Total chunks created: {results.total_chunks}
-                    </p>
+                    {results.total_chunks !== undefined && (
+                      <p className="text-sm text-gray-600">
+                        Total chunks created: {results.total_chunks}
+                      </p>
+                    )}
                     {results.results && (
                       <div className="space-y-1">
                         {results.results.map((result: any, index: number) => (
                           <div
                             key={index}
                             className={`text-sm p-2 rounded ${
-                              result.status === "success"
-                                ? "bg-green-100 text-green-800"
-                                : "bg-red-100 text-red-800"
+                              FILE_STATUS_STYLES[result.status] ??
+                              "bg-blue-50 text-blue-800"
                             }`}
                           >
                             <strong>{result.filename}:</strong> {result.message}
@@ -9,6 +9,7 @@ export const API_BASE_URL =
 export const API_ENDPOINTS = {
   agent: `${API_BASE_URL}/api/agent`,
   upload: `${API_BASE_URL}/api/upload`,
+  uploadJob: (jobId: string) => `${API_BASE_URL}/api/upload/jobs/${jobId}`,
   documents: (userId: string) => `${API_BASE_URL}/api/documents/${userId}`,
   testRag: `${API_BASE_URL}/api/test-rag`,
 } as const;